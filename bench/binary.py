@@ -0,0 +1,54 @@
+"""Текстовый путь JSON Lines против бинарных записей в `mmap`.
+
+Запуск: python bench/binary.py --count 200000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import generate_packages
+
+import homework
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def text_path(path):
+    with open(path) as stream:
+        packages = list(homework.iter_packages(stream, 'jsonl'))
+    homework.process_packages(packages)
+
+
+def binary_path(path):
+    with homework.MappedPackages(path) as packages:
+        packages.compute()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        text = os.path.join(directory, 'packages.jsonl')
+        binary = os.path.join(directory, 'packages.bin')
+        with open(text, 'w') as output:
+            for package in generate_packages(args.count):
+                output.write(json.dumps(package) + '\n')
+        homework.convert_packages(text, binary)
+        text_time = timed(lambda: text_path(text))
+        binary_time = timed(lambda: binary_path(binary))
+        print(f'jsonl: {os.path.getsize(text) / args.count:6.1f} байт, '
+              f'{args.count / text_time:10.0f} пакетов/с')
+        print(f'mmap:  {os.path.getsize(binary) / args.count:6.1f} байт, '
+              f'{args.count / binary_time:10.0f} пакетов/с '
+              f'(x{text_time / binary_time:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Общие помощники для бенчмарков."""
+import random
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+sys.path.append(str(BASE_DIR))
+
+
+def generate_packages(count: int,
+                      seed: int = 0,
+                      workout_types: Tuple[str, ...] = ('SWM', 'RUN', 'WLK')
+                      ) -> List[Tuple[str, list]]:
+    """Сгенерировать синтетические пакеты датчиков."""
+    rng = random.Random(seed)
+    packages = []
+    for _ in range(count):
+        workout_type = rng.choice(workout_types)
+        data = [rng.randint(100, 20000),
+                rng.uniform(0.25, 3),
+                rng.uniform(40, 120)]
+        if workout_type == 'WLK':
+            data.append(rng.uniform(140, 210))
+        elif workout_type == 'SWM':
+            data += [rng.choice([25, 50]), rng.randint(1, 80)]
+        packages.append((workout_type, data))
+    return packages
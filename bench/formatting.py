@@ -0,0 +1,52 @@
+"""Скорость `InfoMessage.get_message` против прежней версии с `asdict`.
+
+Запуск: python bench/formatting.py --count 100000
+"""
+import argparse
+import time
+from dataclasses import asdict
+
+from common import generate_packages
+
+import homework
+
+TEMPLATE = ('{TEXT_TYPE} {training_type}; '
+            '{TEXT_DURATION} {duration:.3f} ч.; '
+            '{TEXT_DISTANCE} {distance:.3f} км; '
+            '{TEXT_SPEED} {speed:.3f} км/ч; '
+            '{TEXT_CALORIES} {calories:.3f}.')
+
+
+def legacy_message(info):
+    """Прежняя реализация: `asdict` и разбор шаблона на каждый вызов."""
+    return TEMPLATE.format(TEXT_TYPE=info.TEXT_TYPE,
+                           TEXT_DURATION=info.TEXT_DURATION,
+                           TEXT_DISTANCE=info.TEXT_DISTANCE,
+                           TEXT_SPEED=info.TEXT_SPEED,
+                           TEXT_CALORIES=info.TEXT_CALORIES,
+                           **asdict(info))
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+    messages = homework.process_packages(generate_packages(args.count))
+    legacy, legacy_time = timed(
+        lambda: '\n'.join(legacy_message(info) for info in messages) + '\n')
+    fast, fast_time = timed(
+        lambda: homework.render_messages(messages).getvalue())
+    assert legacy == fast, 'Вывод должен совпадать побайтно'
+    print(f'asdict + format: {legacy_time * 1e9 / args.count:8.0f} нс/сообщ.')
+    print(f'render_messages: {fast_time * 1e9 / args.count:8.0f} нс/сообщ. '
+          f'(x{legacy_time / fast_time:.1f})')
+
+
+if __name__ == '__main__':
+    main()
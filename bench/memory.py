@@ -0,0 +1,70 @@
+"""Память на одну запись: объекты с `__dict__`, слоты и `TrainingBatch`.
+
+Размер включает 8 байт указателя на запись в списке. `Training` хранит
+поля в слотах, но оставляет слот `__dict__`, чтобы экземплярам можно
+было присваивать атрибуты. На CPython 3.11 обычный объект и так хранит
+атрибуты без отдельного словаря, поэтому `Running` лишь на 8 байт меньше
+`LegacyRunning`. Без `__dict__` запись заняла бы 64 байта
+(`SlottedRunning`). Заметную экономию даёт только столбцовый
+`TrainingBatch`.
+
+Запуск: python bench/memory.py --count 100000
+"""
+import argparse
+import tracemalloc
+
+from common import generate_packages
+
+import homework
+
+
+class LegacyRunning:
+    """Запись тренировки с `__dict__`, как до перехода на слоты."""
+
+    def __init__(self, action, duration, weight):
+        self.action = action
+        self.duration = duration
+        self.weight = weight
+
+
+class SlottedRunning:
+    """Запись только со слотами полей, без `__dict__`."""
+    __slots__ = ('action', 'duration', 'weight')
+
+    def __init__(self, action, duration, weight):
+        self.action = action
+        self.duration = duration
+        self.weight = weight
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size / len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+    rows = [data for _, data in generate_packages(args.count,
+                                                  workout_types=('RUN',))]
+    results = {
+        'LegacyRunning (__dict__)':
+            lambda: [LegacyRunning(*data) for data in rows],
+        'Running (__slots__+__dict__)':
+            lambda: [homework.Running(*data) for data in rows],
+        'SlottedRunning (__slots__)':
+            lambda: [SlottedRunning(*data) for data in rows],
+        'TrainingBatch (array)':
+            lambda: homework.TrainingBatch('RUN', rows),
+    }
+    for name, build in results.items():
+        print(f'{name:30} {measure(build):8.1f} байт/запись')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Масштабирование `run_parallel` по числу процессов.
+
+Запуск: python bench/parallel.py --count 200000
+"""
+import argparse
+import os
+import time
+
+from common import generate_packages
+
+import homework
+
+
+def measure(packages, workers, chunk_size):
+    start = time.perf_counter()
+    if workers:
+        count = sum(1 for _ in homework.run_parallel(packages, workers,
+                                                     chunk_size))
+    else:
+        count = sum(1 for _ in homework._iter_messages(packages))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    args = parser.parse_args()
+    packages = generate_packages(args.count)
+    baseline = measure(packages, 0, args.chunk_size)
+    print(f'serial:   {baseline:12.0f} пакетов/с')
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        rate = measure(packages, workers, args.chunk_size)
+        print(f'workers={workers:<2} {rate:12.0f} пакетов/с '
+              f'(x{rate / baseline:.2f})')
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
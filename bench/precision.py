@@ -0,0 +1,41 @@
+"""Пакетный расчёт в float64 и float32: скорость, память и ошибка.
+
+Запуск: python bench/precision.py --count 1000000
+"""
+import argparse
+import time
+
+from common import generate_packages
+
+import homework
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000000)
+    args = parser.parse_args()
+    rows = [data for _, data in generate_packages(args.count,
+                                                  workout_types=('RUN',))]
+    reference = None
+    for precision in homework.PRECISIONS:
+        batch = homework.TrainingBatch('RUN', rows, precision)
+        start = time.perf_counter()
+        metrics = batch.compute()
+        elapsed = time.perf_counter() - start
+        size = sum(column.itemsize * len(column)
+                   for column in list(batch.columns.values())
+                   + list(metrics.values()))
+        line = (f'{precision}: {args.count / elapsed:12.0f} пакетов/с, '
+                f'{size / args.count:5.1f} байт/пакет')
+        if reference is None:
+            reference = metrics
+        else:
+            error = max(abs(new - old) / abs(old)
+                        for new, old in zip(metrics['speed'],
+                                            reference['speed']))
+            line += f', макс. отн. ошибка скорости {error:.2e}'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
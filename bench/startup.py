@@ -0,0 +1,80 @@
+"""Время импорта `homework` и запуска коротких вызовов CLI.
+
+Импорт замеряется через `python -X importtime`, вызовы — как запуск
+отдельного процесса: `python homework.py` (скрипт компилируется при каждом
+запуске), `python -m homework` (используется кеш байткода) и передача
+пакетов запущенному серверу (--connect).
+
+Запуск: python bench/startup.py --runs 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BASE_DIR, generate_packages
+
+SCRIPT = [sys.executable, str(BASE_DIR / 'homework.py')]
+MODULE = [sys.executable, '-m', 'homework']
+# Кеш байткода нужен, чтобы замер отражал повторные запуски.
+ENV = {name: value for name, value in os.environ.items()
+       if name != 'PYTHONDONTWRITEBYTECODE'}
+
+
+def import_time():
+    """Кумулятивное время импорта `homework` в микросекундах."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import homework'],
+        cwd=BASE_DIR, env=ENV, capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        _, _, cumulative, name = (part.strip() for part in
+                                  line.replace(':', '|', 1).split('|'))
+        if name == 'homework':
+            return int(cumulative)
+    raise RuntimeError('homework не найден в выводе -X importtime')
+
+
+def run_time(command, runs):
+    """Среднее время одного запуска CLI в миллисекундах."""
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(command, cwd=BASE_DIR, env=ENV,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True)
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    imports = sorted(import_time() for _ in range(5))
+    print(f'import homework:    {imports[2] / 1000:8.1f} мс (медиана)')
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'packages.jsonl')
+        with open(source, 'w') as output:
+            for package in generate_packages(10):
+                output.write(json.dumps(package) + '\n')
+        script = run_time(SCRIPT + [source], args.runs)
+        module = run_time(MODULE + [source], args.runs)
+        print(f'python homework.py: {script:8.1f} мс')
+        print(f'python -m homework: {module:8.1f} мс')
+        socket_path = os.path.join(directory, 'homework.sock')
+        server = subprocess.Popen(MODULE + ['--serve', socket_path],
+                                  cwd=BASE_DIR, env=ENV)
+        try:
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+            connect = run_time(MODULE + [source, '--connect', socket_path],
+                               args.runs)
+            print(f'через сервер:       {connect:8.1f} мс')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
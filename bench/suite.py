@@ -0,0 +1,142 @@
+"""Бенчмарки этапов обработки пакетов для каждого типа тренировки.
+
+Этапы замеряются отдельно: создание объектов (`read_package`), расчёт
+метрик (`compute_metrics`), форматирование (`get_message`), пакетный
+расчёт метрик по столбцам (`compute_batch`) и расчёт специализированными
+функциями (`get_kernel`). Этап `show` замеряет полный путь одной записи
+`read_package(...).show_training_info()`, а `show_overhead` — его
+отношение к сборке `InfoMessage` прямо из формул `calculate`, не
+зависящее от скорости машины.
+
+Запуск:
+    python bench/suite.py --output new.json
+    python bench/suite.py --output new.json --compare old.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from common import generate_packages
+
+import homework
+
+SIZES = (1000, 10000, 100000)
+
+
+def best_time(function, repeat):
+    """Минимальное время выполнения из `repeat` запусков."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_phases(packages, repeat):
+    """Замерить этапы обработки, в наносекундах на пакет."""
+    trainings = [homework.read_package(*package) for package in packages]
+    messages = [training.show_training_info() for training in trainings]
+
+    def construct():
+        for workout_type, data in packages:
+            homework.read_package(workout_type, data)
+
+    def metrics():
+        for training in trainings:
+            training.compute_metrics()
+
+    def format_messages():
+        for info in messages:
+            info.get_message()
+
+    def batch():
+        for workout_type, batch in batches.items():
+            homework.compute_batch(workout_type, batch.columns)
+
+    def show():
+        for workout_type, data in packages:
+            homework.read_package(workout_type, data).show_training_info()
+
+    def plain():
+        for workout_type, data in packages:
+            training_class = homework.WORKOUT_TYPES[workout_type]
+            homework.InfoMessage(training_class.__name__, data[1],
+                                 *training_class.calculate(*data))
+
+    def kernels():
+        for workout_type, data in packages:
+            kernel_for[workout_type](*data)
+
+    kernel_for = {
+        workout_type: homework.get_kernel(training_class)
+        for workout_type, training_class in homework.WORKOUT_TYPES.items()}
+    batches = {}
+    for workout_type, data in packages:
+        if workout_type not in batches:
+            batches[workout_type] = homework.TrainingBatch(workout_type)
+        batches[workout_type].append(data)
+    phases = {'construct': construct, 'metrics': metrics,
+              'format': format_messages, 'batch': batch,
+              'kernel': kernels, 'show': show}
+    results = {name: best_time(function, repeat) * 1e9 / len(packages)
+               for name, function in phases.items()}
+    results['show_overhead'] = results['show'] / (
+        best_time(plain, repeat) * 1e9 / len(packages))
+    return results
+
+
+def run_suite(sizes, repeat):
+    results = {}
+    for workout_type in homework.WORKOUT_TYPES:
+        for size in sizes:
+            packages = generate_packages(size, workout_types=(workout_type,))
+            for phase, value in run_phases(packages, repeat).items():
+                results[f'{workout_type}/{size}/{phase}'] = value
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Вывести сравнение и вернуть список регрессий."""
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        unit = 'x' if name.endswith('_overhead') else 'нс'
+        if old is None:
+            print(f'{name:24} {value:10.1f} {unit}')
+            continue
+        change = value / old - 1
+        mark = ''
+        if change > threshold:
+            regressions.append(name)
+            mark = '  РЕГРЕССИЯ'
+        print(f'{name:24} {value:10.1f} {unit} {change:+8.1%}{mark}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='файл для сохранения JSON')
+    parser.add_argument('--compare', help='JSON предыдущего запуска')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='допустимое замедление, доля (0.1 = 10%%)')
+    args = parser.parse_args()
+    results = run_suite(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'python': platform.python_version(),
+                       'results': results}, output, indent=2)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)['results']
+    if compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
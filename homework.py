@@ -1,8 +1,45 @@
-from dataclasses import asdict, dataclass
-from typing import Dict
+import io
+import math
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from functools import lru_cache, wraps
+from itertools import islice, repeat
+from typing import (IO, TYPE_CHECKING, Callable, ClassVar, Dict, Iterable,
+                    Iterator, List, Mapping, NamedTuple, Sequence, Tuple)
 
+# Модули, нужные отдельным функциям (asyncio, argparse, json, hashlib,
+# threading, NumPy и др.), импортируются внутри этих функций, чтобы не
+# замедлять запуск скрипта.
+if TYPE_CHECKING:
+    import argparse
+    import asyncio
+    from concurrent.futures import Executor
 
-@dataclass
+METRICS: Tuple[str, ...] = ('distance', 'speed', 'calories')
+FORMATS: Tuple[str, ...] = ('jsonl', 'csv', 'binary')
+# Точность пакетного расчёта и код типа `array` для хранения.
+PRECISIONS: Dict[str, str] = {'float64': 'd', 'float32': 'f'}
+# Бинарная запись: код тренировки (4 байта) и до пяти полей пакета.
+RECORD = struct.Struct('<4s5d')
+RECORD_FIELDS = 5
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """Вернуть модуль NumPy или None, если он не установлен."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@dataclass(slots=True)
 class InfoMessage:
     """Информационное сообщение о тренировке."""
     training_type: str
@@ -10,29 +47,103 @@ class InfoMessage:
     distance: float
     speed: float
     calories: float
-    TEXT_TYPE: str = 'Тип тренировки:'
-    TEXT_DURATION: str = 'Длительность:'
-    TEXT_DISTANCE: str = 'Дистанция:'
-    TEXT_SPEED: str = 'Ср. скорость:'
-    TEXT_CALORIES: str = 'Потрачено ккал:'
+    TEXT_TYPE: ClassVar[str] = 'Тип тренировки:'
+    TEXT_DURATION: ClassVar[str] = 'Длительность:'
+    TEXT_DISTANCE: ClassVar[str] = 'Дистанция:'
+    TEXT_SPEED: ClassVar[str] = 'Ср. скорость:'
+    TEXT_CALORIES: ClassVar[str] = 'Потрачено ккал:'
 
-    def get_message(self):
+    def get_message(self) -> str:
         """Метод выводит возвращает строку сообщения."""
-        dict_info = asdict(self)
-        message_text = ('{TEXT_TYPE} {training_type}; '
-                        '{TEXT_DURATION} {duration:.3f} ч.; '
-                        '{TEXT_DISTANCE} {distance:.3f} км; '
-                        '{TEXT_SPEED} {speed:.3f} км/ч; '
-                        '{TEXT_CALORIES} {calories:.3f}.')
-        information = message_text.format(**dict_info)
-        return information
+        return (f'{self.TEXT_TYPE} {self.training_type}; '
+                f'{self.TEXT_DURATION} {self.duration:.3f} ч.; '
+                f'{self.TEXT_DISTANCE} {self.distance:.3f} км; '
+                f'{self.TEXT_SPEED} {self.speed:.3f} км/ч; '
+                f'{self.TEXT_CALORIES} {self.calories:.3f}.')
+
+
+def render_messages(messages: Iterable[InfoMessage],
+                    output: IO = None) -> IO:
+    """Записать строки сообщений в `output` по одной на строку.
+
+    Если `output` не передан, используется новый `io.StringIO`.
+    """
+    if output is None:
+        output = io.StringIO()
+    write = output.write
+    for info in messages:
+        write(info.get_message())
+        write('\n')
+    return output
+
+
+WORKOUT_TYPES: Dict[str, type] = {}
+WORKOUT_ARITY: Dict[str, int] = {}
+
+
+def register_workout(workout_type: str) -> Callable[[type], type]:
+    """Зарегистрировать класс тренировки под кодом `workout_type`.
+
+    Число полей пакета берётся из `FIELDS` класса.
+    """
+    def decorator(training_class: type) -> type:
+        if workout_type in WORKOUT_TYPES:
+            raise ValueError(f'Код {workout_type} уже зарегистрирован')
+        WORKOUT_TYPES[workout_type] = training_class
+        WORKOUT_ARITY[workout_type] = len(training_class.FIELDS)
+        return training_class
+    return decorator
+
+
+def load_workout_plugins(group: str = 'homework.workouts') -> None:
+    """Зарегистрировать классы тренировок из entry points пакетов.
+
+    Имя entry point задаёт код тренировки, значение — класс.
+    """
+    from importlib import metadata
+
+    for entry_point in metadata.entry_points(group=group):
+        register_workout(entry_point.name)(entry_point.load())
+
+
+def get_workout_class(workout_type: str) -> type:
+    """Вернуть класс тренировки по коду."""
+    training_class = WORKOUT_TYPES.get(workout_type)
+    if training_class is None:
+        raise ValueError('Неизвестный workout_type')
+    return training_class
+
+
+class Metrics(NamedTuple):
+    """Производные метрики тренировки."""
+    distance: float
+    speed: float
+    calories: float
+
+
+_new_tuple = tuple.__new__
 
 
 class Training:
-    """Базовый класс тренировки."""
+    """Базовый класс тренировки.
+
+    Формулы наследников принимают уже рассчитанные величины:
+    `_mean_speed` — дистанцию, `_spent_calories` — скорость, поэтому
+    `compute_metrics` считает каждую метрику один раз.
+    """
     M_IN_KM: int = 1000
     LEN_STEP: float = 0.65
     MINUTES_IN_HOUR: int = 60
+    FIELDS: Tuple[str, ...] = ('action', 'duration', 'weight')
+    POSITIVE_FIELDS: Tuple[str, ...] = ('duration',)
+    # Счётчики, которые складываются по интервалам тренировки.
+    ADDITIVE_FIELDS: Tuple[str, ...] = ('action',)
+    # Калории считаются за тренировку целиком и не растут с длительностью.
+    CALORIES_PER_SESSION: bool = False
+    # Слот `__dict__` оставлен, чтобы экземплярам можно было присваивать
+    # атрибуты (например, подменять методы в тестах). Из-за него запись
+    # почти не меньше обычного объекта; экономит память `TrainingBatch`.
+    __slots__ = ('action', 'duration', 'weight', '__dict__')
 
     def __init__(self,
                  action: int,
@@ -54,42 +165,70 @@ class Training:
 
     def get_mean_speed(self) -> float:
         """Получить среднюю скорость движения."""
-        distance = (
-            self.action
-            * self.LEN_STEP
-            / self.M_IN_KM
-        )
+        return self._mean_speed(self.get_distance())
+
+    def get_spent_calories(self) -> float:
+        """Получить количество затраченных калорий."""
+        raise NotImplementedError
+
+    def _mean_speed(self, distance: float) -> float:
         speed = (
             distance
             / self.duration
         )
         return speed
 
-    def get_spent_calories(self) -> float:
-        """Получить количество затраченных калорий."""
+    def _spent_calories(self, speed: float) -> float:
+        # Класс без своей формулы берёт калории из `get_spent_calories`.
+        return self.get_spent_calories()
+
+    @classmethod
+    def calculate(cls, action, duration, weight, *extra) -> Tuple:
+        """Получить дистанцию, скорость и калории по входным данным.
+
+        Формулы повторяют методы `get_*` и работают как с числами,
+        так и с массивами NumPy.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def build_kernel(cls) -> Callable[..., Tuple[float, float, float]]:
+        """Построить функцию расчёта метрик со свёрнутыми константами.
+
+        Функция принимает поля из `FIELDS` и возвращает дистанцию,
+        скорость и калории. Коэффициенты класса читаются один раз при
+        построении, поэтому результат совпадает с `get_*` с точностью
+        до округления.
+        """
         raise NotImplementedError
 
+    def compute_metrics(self) -> Metrics:
+        """Рассчитать дистанцию, скорость и калории за один проход."""
+        distance = self.get_distance()
+        speed = self._mean_speed(distance)
+        # `tuple.__new__` вдвое быстрее сгенерированного `Metrics()`.
+        return _new_tuple(Metrics,
+                          (distance, speed, self._spent_calories(speed)))
+
     def show_training_info(self) -> InfoMessage:
         """Вернуть информационное сообщение о выполненной тренировке."""
-        return InfoMessage(type(self).__name__,
-                           self.duration,
-                           self.get_distance(),
-                           self.get_mean_speed(),
-                           self.get_spent_calories())
+        distance = self.get_distance()
+        speed = self._mean_speed(distance)
+        return InfoMessage(type(self).__name__, self.duration,
+                           distance, speed, self._spent_calories(speed))
 
 
+@register_workout('RUN')
 class Running(Training):
     """Тренировка: бег."""
     COEFF_CALORIES_1: int = 18
     COEFF_CALORIES_2: int = 20
+    __slots__ = ()
 
     def get_spent_calories(self) -> float:
-        distance = (
-            self.action
-            * self.LEN_STEP
-            / self.M_IN_KM
-        )
-        speed = distance / self.duration
+        return self._spent_calories(self.get_mean_speed())
+
+    def _spent_calories(self, speed: float) -> float:
         training_time = (
             self.duration
             * self.MINUTES_IN_HOUR
@@ -103,11 +242,39 @@ class Running(Training):
                 * training_time
                 )
 
+    @classmethod
+    def calculate(cls, action, duration, weight) -> Tuple:
+        distance = action * cls.LEN_STEP / cls.M_IN_KM
+        speed = distance / duration
+        training_time = duration * cls.MINUTES_IN_HOUR
+        calories = ((cls.COEFF_CALORIES_1 * speed - cls.COEFF_CALORIES_2)
+                    * weight / cls.M_IN_KM * training_time)
+        return distance, speed, calories
+
+    @classmethod
+    def build_kernel(cls) -> Callable[..., Tuple[float, float, float]]:
+        # speed * duration == distance, поэтому калории сводятся к
+        # (C1 * distance - C2 * duration) * weight * 60 / 1000.
+        len_step = cls.LEN_STEP
+        m_in_km = cls.M_IN_KM
+        per_km = cls.COEFF_CALORIES_1 * cls.MINUTES_IN_HOUR / cls.M_IN_KM
+        per_hour = cls.COEFF_CALORIES_2 * cls.MINUTES_IN_HOUR / cls.M_IN_KM
+
+        def kernel(action, duration, weight):
+            distance = action * len_step / m_in_km
+            return (distance, distance / duration,
+                    (per_km * distance - per_hour * duration) * weight)
+        return kernel
 
+
+@register_workout('WLK')
 class SportsWalking(Training):
     """Тренировка: спортивная ходьба."""
     COEFF_CALORIES_1: float = 0.035
     COEFF_CALORIES_2: float = 0.029
+    FIELDS: Tuple[str, ...] = Training.FIELDS + ('height',)
+    POSITIVE_FIELDS: Tuple[str, ...] = Training.POSITIVE_FIELDS + ('height',)
+    __slots__ = ('height',)
 
     def __init__(self,
                  action: int,
@@ -118,12 +285,9 @@ class SportsWalking(Training):
         self.height = height
 
     def get_spent_calories(self) -> float:
-        distance = (
-            self.action
-            * self.LEN_STEP
-            / self.M_IN_KM
-        )
-        speed = distance / self.duration
+        return self._spent_calories(self.get_mean_speed())
+
+    def _spent_calories(self, speed: float) -> float:
         training_time = (
             self.duration
             * self.MINUTES_IN_HOUR
@@ -138,11 +302,48 @@ class SportsWalking(Training):
             * training_time
         )
 
+    @classmethod
+    def calculate(cls, action, duration, weight, height) -> Tuple:
+        distance = action * cls.LEN_STEP / cls.M_IN_KM
+        speed = distance / duration
+        training_time = duration * cls.MINUTES_IN_HOUR
+        calories = ((cls.COEFF_CALORIES_1 * weight
+                     + (speed ** 2 // height)
+                     * cls.COEFF_CALORIES_2 * weight)
+                    * training_time)
+        return distance, speed, calories
 
+    @classmethod
+    def build_kernel(cls) -> Callable[..., Tuple[float, float, float]]:
+        # Дистанция и скорость считаются без свёртки, чтобы целая часть
+        # speed ** 2 // height совпадала с `get_spent_calories`.
+        len_step = cls.LEN_STEP
+        m_in_km = cls.M_IN_KM
+        base = cls.COEFF_CALORIES_1 * cls.MINUTES_IN_HOUR
+        per_unit = cls.COEFF_CALORIES_2 * cls.MINUTES_IN_HOUR
+
+        def kernel(action, duration, weight, height):
+            distance = action * len_step / m_in_km
+            speed = distance / duration
+            return (distance, speed,
+                    (base + speed * speed // height * per_unit)
+                    * weight * duration)
+        return kernel
+
+
+@register_workout('SWM')
 class Swimming(Training):
     """Тренировка: плавание."""
     LEN_STEP: float = 1.38
     COEFF_CALORIES_1: float = 1.1
+    FIELDS: Tuple[str, ...] = Training.FIELDS + ('length_pool',
+                                                 'count_pool')
+    POSITIVE_FIELDS: Tuple[str, ...] = Training.POSITIVE_FIELDS + (
+        'length_pool',)
+    ADDITIVE_FIELDS: Tuple[str, ...] = Training.ADDITIVE_FIELDS + (
+        'count_pool',)
+    CALORIES_PER_SESSION: bool = True
+    __slots__ = ('length_pool', 'count_pool')
 
     def __init__(self,
                  action: int,
@@ -155,52 +356,2342 @@ class Swimming(Training):
         self.count_pool = count_pool
 
     def get_mean_speed(self) -> float:
-        speed = (
-            self.length_pool
-            * self.count_pool
-            / self.M_IN_KM
-            / self.duration
-        )
-        return speed
+        # Скорость плавания считается по бассейнам, а не по дистанции.
+        return self._mean_speed(None)
 
     def get_spent_calories(self) -> float:
+        return self._spent_calories(self.get_mean_speed())
+
+    def _mean_speed(self, distance: float) -> float:
         speed = (
             self.length_pool
             * self.count_pool
             / self.M_IN_KM
             / self.duration
         )
+        return speed
+
+    def _spent_calories(self, speed: float) -> float:
         return (
             (speed
              + self.COEFF_CALORIES_1)
             * 2 * self.weight
         )
 
+    @classmethod
+    def calculate(cls, action, duration, weight,
+                  length_pool, count_pool) -> Tuple:
+        distance = action * cls.LEN_STEP / cls.M_IN_KM
+        speed = length_pool * count_pool / cls.M_IN_KM / duration
+        calories = (speed + cls.COEFF_CALORIES_1) * 2 * weight
+        return distance, speed, calories
+
+    @classmethod
+    def build_kernel(cls) -> Callable[..., Tuple[float, float, float]]:
+        len_step = cls.LEN_STEP
+        m_in_km = cls.M_IN_KM
+        km_per_m = 1 / cls.M_IN_KM
+        offset = cls.COEFF_CALORIES_1
+
+        def kernel(action, duration, weight, length_pool, count_pool):
+            speed = length_pool * count_pool * km_per_m / duration
+            return (action * len_step / m_in_km, speed,
+                    (speed + offset) * 2 * weight)
+        return kernel
+
+
+@lru_cache(maxsize=None)
+def get_kernel(training_class: type) -> Callable[..., Tuple]:
+    """Вернуть специализированную функцию расчёта для класса тренировки.
+
+    Функции строятся по одной на класс, в том числе для наследников
+    с переопределёнными коэффициентами. После изменения коэффициентов
+    уже построенного класса вызовите `get_kernel.cache_clear()`.
+    """
+    return training_class.build_kernel()
+
 
 def read_package(workout_type: str, data: list) -> Training:
     """Прочитать данные полученные от датчиков."""
-    dict_type: Dict[str, type[Training]] = {'SWM': Swimming,
-                                            'RUN': Running,
-                                            'WLK': SportsWalking
-                                            }
-    if workout_type not in dict_type:
-        raise ValueError('Неизвестный workout_type')
-    return dict_type[workout_type](*data)
+    return get_workout_class(workout_type)(*data)
+
+
+def read_packages(packages: Iterable[Tuple[str, list]]) -> List[Training]:
+    """Прочитать пакеты в объекты тренировок в исходном порядке."""
+    get_class = get_workout_class
+    return [get_class(workout_type)(*data) for workout_type, data in packages]
+
+
+def compute_batch(workout_type: str,
+                  columns: Mapping[str, Sequence[float]],
+                  precision: str = 'float64') -> Dict:
+    """Рассчитать метрики для столбцов данных одного типа тренировки.
+
+    `columns` сопоставляет имена полей из `FIELDS` с последовательностями
+    значений. Возвращает словарь с массивами `distance`, `speed` и
+    `calories`: NumPy, если он установлен, иначе `array`.
+
+    При `precision='float32'` значения хранятся (а с NumPy и считаются)
+    в одинарной точности, что вдвое сокращает память. Относительная
+    ошибка дистанции и скорости не превышает 1e-6 от расчёта в float64;
+    ошибка калорий не превышает 1e-6 от суммы модулей слагаемых формулы
+    (при почти полном взаимном вычитании слагаемых у бега относительная
+    ошибка может быть больше). У спортивной ходьбы целая часть
+    `speed ** 2 // height` может отличаться на 1, если частное ближе
+    1e-6 к целому числу. Три знака после запятой в `InfoMessage`
+    сохраняются, пока значения меньше ~100, а для больших значений
+    может измениться последний знак.
+
+    Переполнение и деление на ноль выбрасывают `ArithmeticError` в обоих
+    режимах вместо тихих `inf` и `nan`: без NumPy — `OverflowError` или
+    `ZeroDivisionError`, с NumPy — `FloatingPointError`.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f'Неизвестная точность: {precision}')
+    training_class = get_workout_class(workout_type)
+    values = [columns[name] for name in training_class.FIELDS]
+    np = _numpy()
+    if np is not None:
+        arrays = [np.asarray(value, dtype=precision) for value in values]
+        with np.errstate(over='raise', divide='raise', invalid='raise'):
+            return dict(zip(METRICS, training_class.calculate(*arrays)))
+    result = {name: array(PRECISIONS[precision]) for name in METRICS}
+    finite = math.isfinite
+    for row in zip(*values):
+        for name, value in zip(METRICS, training_class.calculate(*row)):
+            if not finite(value):
+                raise OverflowError(f'Переполнение при расчёте {name}')
+            result[name].append(value)
+    return result
+
+
+@dataclass
+class ValidationReport:
+    """Результат проверки пакетов: маска годных и ошибки по индексам."""
+    mask: List[bool]
+    errors: Dict[int, str]
+
+    @property
+    def valid(self) -> int:
+        """Количество годных пакетов."""
+        return len(self.mask) - len(self.errors)
+
+    def select(self, packages: Sequence) -> list:
+        """Оставить только годные пакеты."""
+        return [package for package, ok in zip(packages, self.mask) if ok]
+
+
+def _is_real(value) -> bool:
+    """Проверить, что значение — вещественное число, но не bool.
+
+    Обычные `int` и `float` стоит отсеивать до вызова: проверка
+    `numbers.Real` нужна для типов вроде `numpy.int64` и заметно
+    медленнее.
+    """
+    import numbers
+
+    return not isinstance(value, bool) and isinstance(value, numbers.Real)
+
+
+def _check_package(workout_type: str, data: Sequence) -> str:
+    """Вернуть описание ошибки пакета или пустую строку."""
+    training_class = WORKOUT_TYPES.get(workout_type)
+    if training_class is None:
+        return f'Неизвестный workout_type: {workout_type}'
+    if len(data) != WORKOUT_ARITY[workout_type]:
+        return f'Неверное число полей для {workout_type}: {len(data)}'
+    values = dict(zip(training_class.FIELDS, data))
+    for name, value in values.items():
+        if type(value) not in (int, float) and not _is_real(value):
+            return f'Поле {name} должно быть числом'
+        if value != value or value in (float('inf'), float('-inf')):
+            return f'Поле {name} должно быть конечным'
+    for name in training_class.POSITIVE_FIELDS:
+        if values[name] <= 0:
+            return f'Поле {name} должно быть положительным'
+    return ''
+
+
+def validate_packages(packages: Sequence[Tuple[str, Sequence]]
+                      ) -> ValidationReport:
+    """Проверить код, число полей, типы и диапазоны значений пакетов.
+
+    Пакеты не превращаются в объекты `Training`, поэтому ошибки
+    собираются в отчёт, а не выбрасываются исключениями.
+    """
+    mask = []
+    errors = {}
+    for index, package in enumerate(packages):
+        try:
+            workout_type, data = package
+            error = _check_package(workout_type, data)
+        except (TypeError, ValueError):
+            error = 'Пакет должен иметь вид (workout_type, data)'
+        if error:
+            errors[index] = error
+        mask.append(not error)
+    return ValidationReport(mask, errors)
+
+
+def validate_columns(workout_type: str,
+                     columns: Mapping[str, Sequence[float]]) -> Sequence:
+    """Вернуть маску строк столбцов, годных для `compute_batch`.
+
+    Строка годна, если все её значения — конечные числа, а поля
+    `POSITIVE_FIELDS` больше нуля; нечисловые значения помечаются
+    `False`. Столбцы разной длины дают `ValueError`. С NumPy числовые
+    столбцы проверяются векторно за один проход по каждому.
+    """
+    training_class = get_workout_class(workout_type)
+    positive = training_class.POSITIVE_FIELDS
+    lengths = {name: len(columns[name]) for name in training_class.FIELDS}
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f'Столбцы {workout_type} разной длины: {lengths}')
+    np = _numpy()
+    if np is not None:
+        mask = None
+        for name in training_class.FIELDS:
+            column = np.asarray(columns[name])
+            if column.dtype.kind in 'iuf':
+                valid = np.isfinite(column)
+                if name in positive:
+                    valid &= column > 0
+            else:
+                # NumPy приводит смешанный столбец к строкам, поэтому
+                # проверяются исходные значения.
+                valid = np.array(_column_mask(columns[name],
+                                              name in positive), dtype=bool)
+            mask = valid if mask is None else mask & valid
+        return mask
+    mask = [True] * lengths[training_class.FIELDS[0]]
+    for name in training_class.FIELDS:
+        for index, ok in enumerate(_column_mask(columns[name],
+                                                name in positive)):
+            if not ok:
+                mask[index] = False
+    return mask
+
+
+def _column_mask(column: Iterable, must_be_positive: bool) -> List[bool]:
+    finite = math.isfinite
+    return [(type(value) in (int, float) or _is_real(value))
+            and finite(value) and (not must_be_positive or value > 0)
+            for value in column]
+
+
+class TrainingBatch:
+    """Столбцовое хранилище пакетов одного типа тренировки.
+
+    При `precision='float32'` столбцы хранятся в одинарной точности
+    и рассчитываются в том же режиме `compute_batch`.
+    """
+    __slots__ = ('workout_type', 'precision', 'columns')
+
+    def __init__(self, workout_type: str,
+                 rows: Iterable[Sequence[float]] = (),
+                 precision: str = 'float64') -> None:
+        training_class = get_workout_class(workout_type)
+        if precision not in PRECISIONS:
+            raise ValueError(f'Неизвестная точность: {precision}')
+        self.workout_type = workout_type
+        self.precision = precision
+        self.columns: Dict[str, array] = {
+            name: array(PRECISIONS[precision])
+            for name in training_class.FIELDS
+        }
+        self.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self.columns['action'])
+
+    def append(self, data: Sequence[float]) -> None:
+        """Добавить пакет в конец столбцов."""
+        if len(data) != len(self.columns):
+            raise TypeError(
+                f'Неверное число полей для {self.workout_type}')
+        values = [float(value) for value in data]
+        for column, value in zip(self.columns.values(), values):
+            column.append(value)
+
+    def extend(self, rows: Iterable[Sequence[float]]) -> None:
+        """Добавить несколько пакетов."""
+        for data in rows:
+            self.append(data)
+
+    def compute(self) -> Dict:
+        """Рассчитать метрики для всех пакетов через `compute_batch`."""
+        return compute_batch(self.workout_type, self.columns, self.precision)
+
+
+def process_packages(packages: Sequence[Tuple[str, list]]
+                     ) -> List[InfoMessage]:
+    """Рассчитать сообщения для пакетов через `compute_batch`.
+
+    Пакеты группируются по типу тренировки, поэтому расчёт идёт целыми
+    столбцами, а сообщения возвращаются в исходном порядке.
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, (workout_type, data) in enumerate(packages):
+        get_workout_class(workout_type)
+        if len(data) != WORKOUT_ARITY[workout_type]:
+            raise TypeError(f'Неверное число полей для {workout_type}')
+        groups.setdefault(workout_type, []).append(index)
+    messages: List[InfoMessage] = [None] * len(packages)
+    for workout_type, indexes in groups.items():
+        training_class = WORKOUT_TYPES[workout_type]
+        rows = [packages[index][1] for index in indexes]
+        columns = dict(zip(training_class.FIELDS, zip(*rows)))
+        metrics = compute_batch(workout_type, columns)
+        for position, index in enumerate(indexes):
+            messages[index] = InfoMessage(
+                training_class.__name__,
+                columns['duration'][position],
+                float(metrics['distance'][position]),
+                float(metrics['speed'][position]),
+                float(metrics['calories'][position]))
+    return messages
+
+
+@dataclass
+class IntervalReport:
+    """Метрики тренировки по интервалам и за всю тренировку."""
+    interval: float
+    intervals: Dict
+    total: Metrics
+
+
+def compute_intervals(workout_type: str,
+                      data: Sequence[float],
+                      series: Mapping[str, Sequence[float]],
+                      precision: str = 'float64') -> IntervalReport:
+    """Рассчитать метрики для каждого равного интервала тренировки.
+
+    `data` — обычный пакет, `series` сопоставляет поля из
+    `ADDITIVE_FIELDS` (шаги, гребки, бассейны) со значениями по
+    интервалам, например по одному на минуту. Длительность интервала
+    равна `duration / n`. Счётчики без ряда делятся поровну, остальные
+    поля общие для всех интервалов. Интервалы считаются одним вызовом
+    `compute_batch`, а итог — классом тренировки по суммам рядов.
+
+    Если формула калорий не зависит от длительности
+    (`CALORIES_PER_SESSION`, как у плавания), калории интервала делятся
+    на число интервалов, чтобы их сумма совпадала с итогом.
+    """
+    training_class = get_workout_class(workout_type)
+    if len(data) != WORKOUT_ARITY[workout_type]:
+        raise TypeError(f'Неверное число полей для {workout_type}')
+    unknown = set(series) - set(training_class.ADDITIVE_FIELDS)
+    if unknown:
+        raise ValueError(
+            f'Поля {sorted(unknown)} не делятся на интервалы '
+            f'для {workout_type}')
+    lengths = {len(values) for values in series.values()}
+    if len(lengths) != 1 or not min(lengths):
+        raise ValueError('Ряды интервалов должны быть одной ненулевой длины')
+    count = lengths.pop()
+    package = dict(zip(training_class.FIELDS, data))
+    np = _numpy()
+
+    def fill(value: float, size: int) -> Iterable[float]:
+        return repeat(value, size) if np is None else np.full(size, value)
+
+    columns = {}
+    for name, value in package.items():
+        if name in series:
+            columns[name] = series[name]
+            package[name] = math.fsum(series[name])
+        elif name == 'duration' or name in training_class.ADDITIVE_FIELDS:
+            columns[name] = fill(value / count, count)
+        else:
+            columns[name] = fill(value, count)
+    total = training_class(*package.values()).compute_metrics()
+    intervals = compute_batch(workout_type, columns, precision)
+    if training_class.CALORIES_PER_SESSION:
+        calories = intervals['calories']
+        intervals['calories'] = (
+            calories / count if np is not None
+            else array(calories.typecode,
+                       [value / count for value in calories]))
+    return IntervalReport(package['duration'] / count, intervals, total)
+
+
+def _render_chunk(chunk: List[Tuple[str, list]]) -> list:
+    """Рассчитать сообщения порцией, а при ошибке — по одному пакету.
+
+    Проверенный пакет ещё может переполнить формулу (например,
+    `speed ** 2` при огромной скорости); вместо его сообщения
+    возвращается исключение `ArithmeticError`.
+    """
+    try:
+        return [info.get_message() for info in process_packages(chunk)]
+    except ArithmeticError:
+        pass
+    return [info if isinstance(info, ArithmeticError) else info.get_message()
+            for info in _process_each(chunk)]
+
+
+def _process_each(chunk: List[Tuple[str, list]]) -> list:
+    """Рассчитать пакеты по одному, заменяя переполнение исключением."""
+    results = []
+    for package in chunk:
+        try:
+            info, = process_packages([package])
+        except ArithmeticError as error:
+            info = error
+        results.append(info)
+    return results
+
+
+def _iter_rendered(results: list, stats: 'StreamStats') -> Iterator[str]:
+    for result in results:
+        if isinstance(result, str):
+            yield result
+        elif stats is None:
+            raise result
+        else:
+            stats.skipped += 1
+
+
+def run_parallel(packages: Iterable[Tuple[str, list]],
+                 workers: int = None,
+                 chunk_size: int = 1000,
+                 ordered: bool = True,
+                 stats: 'StreamStats' = None) -> Iterator[str]:
+    """Рассчитать сообщения для потока пакетов в пуле процессов.
+
+    Поток делится на порции по `chunk_size` пакетов, в работе держится
+    не больше двух порций на процесс. При `ordered=False` сообщения
+    отдаются по мере готовности порций. Пакет, переполнивший формулу,
+    выбрасывает `ArithmeticError`, а если передана `stats` —
+    пропускается и считается в `stats.skipped`.
+    """
+    from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                    wait)
+
+    packages = iter(packages)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as executor:
+        limit = workers * 2
+        pending = deque()
+        while True:
+            while len(pending) < limit:
+                chunk = list(islice(packages, chunk_size))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_render_chunk, chunk))
+            if not pending:
+                return
+            if ordered:
+                yield from _iter_rendered(pending.popleft().result(), stats)
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                yield from _iter_rendered(future.result(), stats)
+
+
+@dataclass
+class CacheStats:
+    """Статистика `PackageCache`."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class PackageCache:
+    """Потокобезопасный LRU-кеш сообщений для повторяющихся пакетов.
+
+    Ключ кеша — `(workout_type, tuple(data))`. Записи вытесняются при
+    превышении `maxsize`, а при заданном `ttl` устаревают через `ttl`
+    секунд. Возвращаемые `InfoMessage` общие для всех обращений, их
+    не следует изменять.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        import threading
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: tuple) -> list:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                    entry[0] is None or entry[0] > self._clock()):
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+                self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+    def _store(self, key: tuple, entry: list) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _entry(self, workout_type: str, data: Sequence) -> list:
+        key = (workout_type, tuple(data))
+        entry = self._lookup(key)
+        if entry is None:
+            info = read_package(workout_type, data).show_training_info()
+            expires = None if self.ttl is None else self._clock() + self.ttl
+            entry = [expires, info, info.get_message()]
+            self._store(key, entry)
+        return entry
+
+    def get_info(self, workout_type: str, data: Sequence) -> InfoMessage:
+        """Вернуть сообщение о тренировке, рассчитав его при промахе."""
+        return self._entry(workout_type, data)[1]
+
+    def get_message(self, workout_type: str, data: Sequence) -> str:
+        """Вернуть строку сообщения о тренировке."""
+        return self._entry(workout_type, data)[2]
+
+    def clear(self) -> None:
+        """Удалить все записи, не сбрасывая статистику."""
+        with self._lock:
+            self._entries.clear()
+
+
+EXPORT_COLUMNS: Tuple[str, ...] = ('training_type', 'duration',
+                                   'distance', 'speed', 'calories')
+
+
+class ExportSink:
+    """Столбцовый экспорт результатов с буферизацией по группам строк.
+
+    Строки копятся в столбцах и записываются группой, как только их
+    становится `row_group_size`. Наследники реализуют `_write_group`.
+    """
+
+    def __init__(self, path: str, row_group_size: int = 65536) -> None:
+        self.path = path
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._columns: Dict[str, Sequence] = {'training_type': []}
+        for name in EXPORT_COLUMNS[1:]:
+            self._columns[name] = array('d')
+
+    def __enter__(self) -> 'ExportSink':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, info: InfoMessage) -> None:
+        """Добавить одно сообщение о тренировке."""
+        for name in EXPORT_COLUMNS:
+            self._columns[name].append(getattr(info, name))
+        self._maybe_flush()
+
+    def write_batch(self, workout_type: str,
+                    columns: Mapping[str, Sequence[float]],
+                    metrics: Mapping[str, Sequence[float]]) -> None:
+        """Добавить результаты `compute_batch` для столбцов `columns`."""
+        training_type = get_workout_class(workout_type).__name__
+        count = len(metrics['distance'])
+        self._columns['training_type'].extend([training_type] * count)
+        self._columns['duration'].extend(columns['duration'])
+        for name in METRICS:
+            self._columns[name].extend(metrics[name])
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self._columns['training_type']) >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Записать накопленные строки."""
+        count = len(self._columns['training_type'])
+        if count:
+            self._write_group(self._columns)
+            self.rows += count
+            self._reset()
+
+    def close(self) -> None:
+        """Записать остаток и закрыть файл."""
+        self.flush()
+
+    def _write_group(self, columns: Dict[str, Sequence]) -> None:
+        raise NotImplementedError
+
+
+class CsvExportSink(ExportSink):
+    """Экспорт в CSV средствами стандартной библиотеки."""
+
+    def __init__(self, path: str, row_group_size: int = 65536) -> None:
+        import csv
+
+        super().__init__(path, row_group_size)
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def _write_group(self, columns: Dict[str, Sequence]) -> None:
+        self._writer.writerows(zip(*columns.values()))
+
+    def close(self) -> None:
+        super().close()
+        self._file.close()
+
+
+class _ArrowExportSink(ExportSink):
+
+    def __init__(self, path: str, row_group_size: int = 65536) -> None:
+        import pyarrow
+        super().__init__(path, row_group_size)
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema(
+            [('training_type', pyarrow.string())]
+            + [(name, pyarrow.float64()) for name in EXPORT_COLUMNS[1:]])
+        self._writer = self._open_writer()
+
+    def _open_writer(self):
+        raise NotImplementedError
+
+    def _write_group(self, columns: Dict[str, Sequence]) -> None:
+        self._writer.write_table(
+            self._pyarrow.table(columns, schema=self._schema))
+
+    def close(self) -> None:
+        super().close()
+        self._writer.close()
+
+
+class ArrowExportSink(_ArrowExportSink):
+    """Экспорт в файл Arrow IPC; требует `pyarrow`."""
+
+    def _open_writer(self):
+        return self._pyarrow.ipc.new_file(self.path, self._schema)
+
+
+class ParquetExportSink(_ArrowExportSink):
+    """Экспорт в Parquet, одна группа строк на запись; требует `pyarrow`."""
+
+    def _open_writer(self):
+        from pyarrow import parquet
+        return parquet.ParquetWriter(self.path, self._schema)
+
+
+EXPORT_SINKS: Dict[str, type] = {'csv': CsvExportSink,
+                                 'arrow': ArrowExportSink,
+                                 'parquet': ParquetExportSink}
+
+
+def open_export_sink(path: str, fmt: str = None,
+                     row_group_size: int = 65536) -> ExportSink:
+    """Открыть экспорт в формате `fmt` или по расширению файла."""
+    if fmt is None:
+        fmt = os.path.splitext(path)[1].lstrip('.').lower()
+        fmt = {'feather': 'arrow', 'ipc': 'arrow'}.get(fmt, fmt)
+    if fmt not in EXPORT_SINKS:
+        raise ValueError(f'Неизвестный формат экспорта: {fmt}')
+    return EXPORT_SINKS[fmt](path, row_group_size)
+
+
+@dataclass
+class StreamStats:
+    """Статистика обработки потока пакетов.
+
+    `skipped` — число пропущенных некорректных пакетов.
+    """
+    packages: int
+    seconds: float
+    skipped: int = 0
+
+    @property
+    def rate(self) -> float:
+        """Пропускная способность в пакетах в секунду."""
+        if not self.seconds:
+            return 0.0
+        return self.packages / self.seconds
+
+
+def pack_record(workout_type: str, data: Sequence[float]) -> bytes:
+    """Упаковать пакет в бинарную запись фиксированной длины.
+
+    В запись помещаются коды до 4 байт ASCII и до 5 полей; для других
+    пакетов выбрасывается `ValueError`, а не пишется усечённая запись.
+    """
+    if len(workout_type) > 4 or not workout_type.isascii():
+        raise ValueError(f'Код {workout_type!r} не помещается в запись: '
+                         'допустимо до 4 символов ASCII')
+    if len(data) > RECORD_FIELDS:
+        raise ValueError(f'Пакет {workout_type} не помещается в запись: '
+                         f'{len(data)} полей, допустимо {RECORD_FIELDS}')
+    values = list(data) + [0.0] * (RECORD_FIELDS - len(data))
+    return RECORD.pack(workout_type.encode('ascii'), *values)
+
+
+def unpack_record(record: bytes) -> Tuple[str, list]:
+    """Распаковать бинарную запись в пакет `(workout_type, data)`."""
+    code, *values = RECORD.unpack(record)
+    workout_type = code.rstrip(b'\0').decode('ascii')
+    get_workout_class(workout_type)
+    return workout_type, values[:WORKOUT_ARITY[workout_type]]
+
+
+def parse_json_package(line: str) -> Tuple[str, list]:
+    """Разобрать строку пакета JSON.
+
+    Пакет задаётся списком `["RUN", [...]]` или объектом с ключами
+    `workout_type` и `data`.
+    """
+    import json
+
+    package = json.loads(line)
+    if isinstance(package, dict):
+        return package['workout_type'], package['data']
+    workout_type, data = package
+    return workout_type, data
+
+
+def write_records(packages: Iterable[Tuple[str, list]],
+                  stream: IO) -> int:
+    """Записать пакеты в бинарный поток записями `RECORD`."""
+    count = 0
+    for workout_type, data in packages:
+        stream.write(pack_record(workout_type, data))
+        count += 1
+    return count
+
+
+def convert_packages(source: str, destination: str,
+                     fmt: str = 'jsonl') -> int:
+    """Перевести файл пакетов JSON Lines или CSV в бинарный формат."""
+    with open(source, newline='') as stream, \
+            open(destination, 'wb') as output:
+        return write_records(iter_packages(stream, fmt), output)
+
+
+class MappedPackages:
+    """Бинарный файл пакетов, отображённый в память.
+
+    Файл не копируется в память: `iter_batches` распаковывает срезы
+    `memoryview`, а `columns` при наличии NumPy читает записи через
+    `np.frombuffer` и копирует только столбцы выбранного типа.
+    """
+
+    def __init__(self, path: str) -> None:
+        import mmap
+
+        with open(path, 'rb') as stream:
+            size = os.fstat(stream.fileno()).st_size
+            if size % RECORD.size:
+                raise ValueError(f'Размер {path} не кратен {RECORD.size}')
+            self._mmap = (mmap.mmap(stream.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+                          if size else None)
+        self._view = memoryview(self._mmap if size else b'')
+
+    def __len__(self) -> int:
+        return len(self._view) // RECORD.size
+
+    def __enter__(self) -> 'MappedPackages':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Освободить отображение файла."""
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def iter_batches(self, batch_size: int = 4096) -> Iterator[List[tuple]]:
+        """Отдавать распакованные записи `RECORD` порциями."""
+        step = batch_size * RECORD.size
+        for start in range(0, len(self._view), step):
+            yield list(RECORD.iter_unpack(self._view[start:start + step]))
+
+    def columns(self) -> Dict[str, Dict[str, Sequence[float]]]:
+        """Столбцы полей, сгруппированные по коду тренировки."""
+        np = _numpy()
+        if np is not None:
+            records = np.frombuffer(self._view, dtype=np.dtype(
+                [('code', 'S4'), ('values', '<f8', (5,))]))
+            result = {}
+            for code in np.unique(records['code']):
+                workout_type = code.decode('ascii')
+                values = records['values'][records['code'] == code]
+                fields = get_workout_class(workout_type).FIELDS
+                result[workout_type] = {
+                    name: values[:, index]
+                    for index, name in enumerate(fields)}
+            return result
+        batches: Dict[bytes, TrainingBatch] = {}
+        for batch in self.iter_batches():
+            for code, *values in batch:
+                if code not in batches:
+                    batches[code] = TrainingBatch(
+                        code.rstrip(b'\0').decode('ascii'))
+                training_batch = batches[code]
+                training_batch.append(values[:len(training_batch.columns)])
+        return {batch.workout_type: batch.columns
+                for batch in batches.values()}
+
+    def compute(self) -> Dict[str, Dict]:
+        """Рассчитать метрики всех записей по типам тренировок."""
+        return {workout_type: compute_batch(workout_type, columns)
+                for workout_type, columns in self.columns().items()}
+
+
+def _parse_all(parse: Callable[..., Tuple[str, list]],
+               items: Iterable,
+               stats: StreamStats) -> Iterator[Tuple[str, list]]:
+    for item in items:
+        try:
+            package = parse(item)
+        except (ValueError, TypeError, KeyError):
+            if stats is None:
+                raise
+            stats.skipped += 1
+            continue
+        yield package
+
+
+def _parse_csv_row(row: List[str]) -> Tuple[str, list]:
+    return row[0], [float(value) for value in row[1:]]
 
 
-def main(training: Training) -> None:
+def _iter_jsonl(stream: IO,
+                stats: StreamStats) -> Iterator[Tuple[str, list]]:
+    return _parse_all(parse_json_package,
+                      (line for line in stream if line.strip()), stats)
+
+
+def _iter_csv(stream: IO,
+              stats: StreamStats) -> Iterator[Tuple[str, list]]:
+    import csv
+
+    return _parse_all(_parse_csv_row,
+                      (row for row in csv.reader(stream) if row), stats)
+
+
+def _iter_binary(stream: IO,
+                 stats: StreamStats) -> Iterator[Tuple[str, list]]:
+    def records() -> Iterator[bytes]:
+        while True:
+            record = stream.read(RECORD.size)
+            if len(record) < RECORD.size:
+                if record:
+                    # Как и `MappedPackages`, не обрабатываем
+                    # повреждённый файл молча.
+                    raise ValueError(
+                        f'Неполная запись в конце потока: {len(record)} '
+                        f'байт из {RECORD.size}')
+                return
+            yield record
+    return _parse_all(unpack_record, records(), stats)
+
+
+def iter_packages(stream: IO,
+                  fmt: str = 'jsonl',
+                  stats: StreamStats = None) -> Iterator[Tuple[str, list]]:
+    """Лениво читать пакеты из потока в формате JSON Lines, CSV или binary.
+
+    Для формата `binary` поток должен быть открыт в бинарном режиме.
+    Неразборчивая запись выбрасывает исключение, а если передана
+    `stats` — пропускается и считается в `stats.skipped`.
+    """
+    readers = {'jsonl': _iter_jsonl, 'csv': _iter_csv,
+               'binary': _iter_binary}
+    if fmt not in readers:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+    return readers[fmt](stream, stats)
+
+
+def _iter_valid(packages: Iterable[Tuple[str, list]],
+                chunk_size: int,
+                stats: StreamStats) -> Iterator[Tuple[str, list]]:
+    """Отдать пакеты, прошедшие `validate_packages`, считая остальные."""
+    packages = iter(packages)
+    while True:
+        chunk = list(islice(packages, chunk_size))
+        if not chunk:
+            return
+        report = validate_packages(chunk)
+        stats.skipped += len(report.errors)
+        yield from report.select(chunk) if report.errors else chunk
+
+
+def _iter_messages(packages: Iterable[Tuple[str, list]],
+                   cache: PackageCache,
+                   stats: StreamStats) -> Iterator[str]:
+    # Годный по полям пакет ещё может переполнить формулу (1e200 шагов).
+    if cache is not None:
+        render = cache.get_message
+    else:
+        def render(workout_type: str, data: list) -> str:
+            training = read_package(workout_type, data)
+            return training.show_training_info().get_message()
+    for workout_type, data in packages:
+        try:
+            yield render(workout_type, data)
+        except ArithmeticError:
+            stats.skipped += 1
+
+
+class OutputSink:
+    """Приёмник строк сообщений."""
+
+    def write(self, message: str) -> None:
+        """Записать одну строку сообщения."""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Отдать накопленные строки получателю."""
+
+    def close(self) -> None:
+        """Записать остаток и освободить ресурсы."""
+        self.flush()
+
+    def __enter__(self) -> 'OutputSink':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class StdoutSink(OutputSink):
+    """Вывод каждой строки в текущий `sys.stdout`, как `print`."""
+
+    def write(self, message: str) -> None:
+        print(message)
+
+
+class BufferedSink(OutputSink):
+    """Буферизованная запись строк в текстовый поток.
+
+    Строки отдаются одной записью, когда их накопится `flush_size`.
+    При ненулевом `flush_interval` фоновый поток дописывает буфер
+    каждые `flush_interval` секунд, поэтому строки не задерживаются,
+    даже когда источник (например, медленный stdin) надолго замолкает.
+    Поток останавливается в `close`.
+    """
+
+    def __init__(self, stream: IO, flush_size: int = 1024,
+                 flush_interval: float = 1.0) -> None:
+        import threading
+
+        self.stream = stream
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def write(self, message: str) -> None:
+        with self._lock:
+            self._buffer.append(message)
+            if len(self._buffer) >= self.flush_size:
+                self._flush_buffer()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_buffer()
+
+    def _flush_buffer(self) -> None:
+        if self._buffer:
+            self._write_chunk('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+
+    def _write_chunk(self, chunk: str) -> None:
+        self.stream.write(chunk)
+        self.stream.flush()
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        super().close()
+
+
+class RotatingFileSink(BufferedSink):
+    """Буферизованная запись в файл с ротацией по размеру.
+
+    Когда файл превысил бы `max_bytes`, он переименовывается в
+    `path.1` (старые копии сдвигаются до `path.<backup_count>`).
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024,
+                 backup_count: int = 5, flush_size: int = 1024,
+                 flush_interval: float = 1.0) -> None:
+        super().__init__(open(path, 'a', encoding='utf-8'),
+                         flush_size, flush_interval)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+    def _write_chunk(self, chunk: str) -> None:
+        size = len(chunk.encode('utf-8'))
+        if self.stream.tell() and self.stream.tell() + size > self.max_bytes:
+            self._rotate()
+        super()._write_chunk(chunk)
+
+    def _rotate(self) -> None:
+        self.stream.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{index}'):
+                os.replace(f'{self.path}.{index}',
+                           f'{self.path}.{index + 1}')
+        if self.backup_count:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+        self.stream = open(self.path, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        super().close()
+        self.stream.close()
+
+
+class AsyncQueueSink(BufferedSink):
+    """Передача порций строк в очередь `asyncio.Queue`.
+
+    Порция — одна строка с несколькими сообщениями. Если передан `loop`,
+    запись можно вести из другого потока: при заполненной очереди поток
+    ждёт освобождения места. Без `loop` очередь не потокобезопасна,
+    поэтому `flush_interval` не действует: порции отдаются по
+    `flush_size` и при `flush`.
+    """
+
+    def __init__(self, queue: 'asyncio.Queue', flush_size: int = 1024,
+                 flush_interval: float = 1.0,
+                 loop: 'asyncio.AbstractEventLoop' = None) -> None:
+        super().__init__(None, flush_size,
+                         flush_interval if loop is not None else 0)
+        self.queue = queue
+        self.loop = loop
+
+    def _write_chunk(self, chunk: str) -> None:
+        if self.loop is None:
+            self.queue.put_nowait(chunk)
+            return
+        import asyncio
+
+        asyncio.run_coroutine_threadsafe(self.queue.put(chunk),
+                                         self.loop).result()
+
+
+STDOUT_SINK = StdoutSink()
+
+
+def run_stream(packages: Iterable[Tuple[str, list]],
+               output: IO,
+               chunk_size: int = 1024,
+               workers: int = 0,
+               cache: PackageCache = None,
+               stats: StreamStats = None) -> StreamStats:
+    """Обработать поток пакетов и записать сообщения порциями.
+
+    `output` — текстовый поток или `OutputSink`; поток оборачивается
+    в `BufferedSink` с порцией `chunk_size`. При `workers > 0` расчёт
+    выполняется в пуле процессов `run_parallel`, иначе повторяющиеся
+    пакеты можно брать из `cache`.
+
+    Пакеты проверяются `validate_packages` порциями по `chunk_size`;
+    некорректные, как и переполняющие формулы, пропускаются и
+    считаются в `StreamStats.skipped`. Чтобы там же считались
+    неразборчивые записи, передайте ту же `stats` в `iter_packages`.
+    """
+    start = time.perf_counter()
+    if stats is None:
+        stats = StreamStats(0, 0.0)
+    owned = not isinstance(output, OutputSink)
+    if owned:
+        output = BufferedSink(output, chunk_size)
+    packages = _iter_valid(packages, chunk_size, stats)
+    if workers:
+        messages = run_parallel(packages, workers, chunk_size, stats=stats)
+    else:
+        messages = _iter_messages(packages, cache, stats)
+    write = output.write
+    try:
+        for message in messages:
+            write(message)
+            stats.packages += 1
+    finally:
+        # Уже рассчитанные сообщения выводятся и при ошибке в потоке.
+        if owned:
+            output.close()
+        else:
+            output.flush()
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def render_lines(lines: Sequence[bytes]) -> List[str]:
+    """Рассчитать сообщения для строк JSON Lines.
+
+    Для некорректной строки вместо сообщения возвращается
+    `ERROR: <описание>`, остальные строки обрабатываются как обычно.
+    `None` вместо строки означает строку длиннее лимита сервера.
+    """
+    results: List[str] = [None] * len(lines)
+    packages = []
+    positions = []
+    for index, line in enumerate(lines):
+        if line is None:
+            results[index] = 'ERROR: Строка длиннее лимита'
+            continue
+        try:
+            packages.append(parse_json_package(line))
+            positions.append(index)
+        except (ValueError, TypeError, KeyError) as error:
+            results[index] = f'ERROR: {error}'
+    report = validate_packages(packages)
+    for position, error in report.errors.items():
+        results[positions[position]] = f'ERROR: {error}'
+    positions = report.select(positions)
+    packages = report.select(packages)
+    for index, message in zip(positions, _render_chunk(packages)):
+        if not isinstance(message, str):
+            message = f'ERROR: {message}'
+        results[index] = message
+    return results
+
+
+async def _read_line(reader: 'asyncio.StreamReader',
+                     timeout: float = None) -> bytes:
+    """Прочитать строку, как `readline`, но не падать на длинной строке.
+
+    Для строки длиннее лимита `reader` возвращается `None`, а сама строка
+    пропускается до перевода строки. Пропуск идёт уже без `timeout`,
+    иначе хвост длинной строки был бы прочитан как следующая строка.
+    """
+    import asyncio
+
+    try:
+        return await asyncio.wait_for(reader.readuntil(b'\n'), timeout)
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+            continue
+        except asyncio.IncompleteReadError:
+            pass
+        return None
+
+
+async def _read_batch(reader: 'asyncio.StreamReader',
+                      batch_size: int,
+                      linger: float) -> List[bytes]:
+    """Прочитать микропакет до `batch_size` строк.
+
+    После первой строки новые ждутся не дольше `linger` секунд.
+    Строка длиннее лимита `reader` попадает в микропакет как `None`.
+    """
+    import asyncio
+
+    lines = []
+    line = await _read_line(reader)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + linger
+    while line != b'':
+        if line is None or line.strip():
+            lines.append(line)
+        timeout = deadline - loop.time()
+        if len(lines) >= batch_size or timeout <= 0:
+            break
+        try:
+            line = await _read_line(reader, timeout)
+        except asyncio.TimeoutError:
+            break
+    return lines
+
+
+class IngestServer:
+    """Сервер asyncio, принимающий пакеты в формате JSON Lines.
+
+    На каждую строку клиенту возвращается строка сообщения в том же
+    порядке. Строки собираются в микропакеты до `batch_size` штук,
+    одновременно рассчитывается не больше `concurrency` микропакетов.
+    Пока микропакет соединения не записан клиенту, следующие строки
+    из сокета не читаются, что даёт обратное давление на клиента.
+    На строку длиннее `limit` байт возвращается `ERROR`.
+    """
+
+    def __init__(self,
+                 concurrency: int = 4,
+                 batch_size: int = 256,
+                 linger: float = 0.001,
+                 executor: 'Executor' = None,
+                 limit: int = 2 ** 16) -> None:
+        import asyncio
+
+        self.batch_size = batch_size
+        self.linger = linger
+        self.executor = executor
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle(self, reader: 'asyncio.StreamReader',
+                     writer: 'asyncio.StreamWriter') -> None:
+        """Обслужить одно соединение."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                lines = await _read_batch(reader, self.batch_size,
+                                          self.linger)
+                if not lines:
+                    break
+                async with self._semaphore:
+                    try:
+                        results = await loop.run_in_executor(
+                            self.executor, render_lines, lines)
+                    except Exception as error:
+                        # Клиент получает ответ на каждую строку, даже
+                        # если микропакет не удалось рассчитать.
+                        results = [f'ERROR: {error!r}'] * len(lines)
+                writer.write(('\n'.join(results) + '\n').encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0,
+                    path: str = None) -> 'asyncio.AbstractServer':
+        """Запустить сервер на TCP-порту или Unix-сокете `path`."""
+        import asyncio
+
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path,
+                                                   limit=self.limit)
+        return await asyncio.start_server(self.handle, host, port,
+                                          limit=self.limit)
+
+
+async def serve(address: str, **options) -> None:
+    """Обслуживать `host:port` или путь к Unix-сокету до остановки."""
+    server = IngestServer(**options)
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        listener = await server.start(host, int(port))
+    else:
+        listener = await server.start(path=address)
+    async with listener:
+        await listener.serve_forever()
+
+
+def send_packages(address: str,
+                  packages: Iterable[Tuple[str, list]],
+                  output: IO) -> int:
+    """Передать пакеты серверу `IngestServer` и вывести его ответы.
+
+    Клиент не импортирует asyncio и ничего не считает сам, поэтому
+    короткие вызовы обходятся без затрат на запуск расчётного движка.
+    Возвращает число ответов.
+    """
+    import json
+    import socket
+    import threading
+
+    if ':' in address:
+        host, port = address.rsplit(':', 1)
+        connection = socket.create_connection((host, int(port)))
+    else:
+        connection = socket.socket(socket.AF_UNIX)
+        connection.connect(address)
+
+    def send() -> None:
+        with connection.makefile('wb') as stream:
+            for workout_type, data in packages:
+                stream.write(json.dumps([workout_type, data]).encode())
+                stream.write(b'\n')
+        connection.shutdown(socket.SHUT_WR)
+
+    # Отправка идёт в отдельном потоке, чтобы ответы сервера читались
+    # одновременно и обратное давление не блокировало обе стороны.
+    sender = threading.Thread(target=send, daemon=True)
+    sender.start()
+    count = 0
+    with connection, connection.makefile('r', encoding='utf-8') as replies:
+        for line in replies:
+            output.write(line)
+            count += 1
+    sender.join()
+    return count
+
+
+def split_shards(path: str, shards: int,
+                 fmt: str = 'jsonl') -> List[Tuple[int, int]]:
+    """Разбить файл пакетов на `shards` диапазонов байтов.
+
+    Границы сдвигаются к концу строки (или к границе записи `RECORD`
+    для бинарного формата), поэтому каждая запись попадает ровно в один
+    диапазон. Пустые диапазоны отбрасываются. Бинарный файл, размер
+    которого не кратен `RECORD.size`, даёт `ValueError`.
+    """
+    size = os.path.getsize(path)
+    if fmt == 'binary' and size % RECORD.size:
+        raise ValueError(f'Размер {path} не кратен {RECORD.size}')
+    bounds = [0]
+    with open(path, 'rb') as stream:
+        for index in range(1, shards):
+            position = max(size * index // shards, bounds[-1])
+            if fmt == 'binary':
+                position -= position % RECORD.size
+            elif position:
+                stream.seek(position - 1)
+                stream.readline()
+                position = stream.tell()
+            bounds.append(min(position, size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:])
+            if end > start]
+
+
+def _iter_range(path: str, start: int, end: int, fmt: str,
+                stats: StreamStats = None) -> Iterator[Tuple[str, list]]:
+    """Лениво читать пакеты из диапазона байтов файла."""
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        if fmt == 'binary':
+            records = (stream.read(RECORD.size)
+                       for _ in range((end - start) // RECORD.size))
+            yield from _parse_all(unpack_record, records, stats)
+            return
+        yield from iter_packages(_iter_range_lines(stream, end - start),
+                                 fmt, stats)
+
+
+def _iter_range_lines(stream: IO, size: int) -> Iterator[str]:
+    while size > 0:
+        line = stream.readline()
+        if not line:
+            return
+        size -= len(line)
+        yield line.decode('utf-8')
+
+
+def process_shard(path: str, start: int, end: int,
+                  fmt: str = 'jsonl',
+                  chunk_size: int = 10000
+                  ) -> Tuple[List[str], Dict[str, list], int]:
+    """Рассчитать сообщения и итоги для диапазона байтов файла.
+
+    Диапазон читается построчно и считается порциями по `chunk_size`
+    пакетов, поэтому в памяти не держится его исходный текст. Итоги
+    сгруппированы по типу тренировки: количество, длительность,
+    дистанция и калории. Неразборчивые, некорректные и переполняющие
+    формулы пакеты пропускаются, как в `run_stream`; их число —
+    третий элемент результата.
+    """
+    stats = StreamStats(0, 0.0)
+    packages = _iter_valid(_iter_range(path, start, end, fmt, stats),
+                           chunk_size, stats)
+    messages = []
+    totals: Dict[str, list] = {}
+    while True:
+        chunk = list(islice(packages, chunk_size))
+        if not chunk:
+            return messages, totals, stats.skipped
+        try:
+            infos = process_packages(chunk)
+        except ArithmeticError:
+            infos = _process_each(chunk)
+        for info in infos:
+            if isinstance(info, ArithmeticError):
+                stats.skipped += 1
+                continue
+            messages.append(info.get_message())
+            total = totals.setdefault(info.training_type,
+                                      [0, 0.0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += info.duration
+            total[2] += info.distance
+            total[3] += info.calories
+
+
+def _shard_worker(address: Tuple[str, int], authkey: bytes) -> None:
+    """Узел-обработчик: получает диапазоны от координатора по сокету."""
+    from multiprocessing.connection import Client
+
+    with Client(address, authkey=authkey) as connection:
+        while True:
+            try:
+                task = connection.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            index, arguments = task
+            try:
+                connection.send((index, process_shard(*arguments), None))
+            except Exception as error:
+                connection.send((index, None, repr(error)))
+
+
+@dataclass
+class ShardReport:
+    """Итог распределённой обработки файла.
+
+    `skipped` — число пропущенных некорректных пакетов.
+    """
+    packages: int
+    totals: Dict[str, list]
+    retries: int
+    skipped: int = 0
+
+
+class ShardCoordinator:
+    """Координатор распределённой обработки файла пакетов.
+
+    Файл делится на диапазоны байтов, которые раздаются узлам —
+    отдельным процессам, подключённым к координатору по сокету
+    `multiprocessing.connection`. Диапазон не больше `shard_bytes`
+    байтов, поэтому память узла ограничена независимо от размера
+    файла, а узлам раздаётся не больше `2 * nodes` диапазонов вперёд
+    от ещё не выведенного. Диапазон с ошибкой или с упавшим узлом
+    отправляется повторно (не больше `retries` раз), упавший узел
+    заменяется новым; узел, не подключившийся за `connect_timeout`
+    секунд, считается упавшим. Сообщения выводятся строго в порядке
+    диапазонов, как только готов очередной из них.
+    """
+
+    def __init__(self, nodes: int = 2, retries: int = 2,
+                 shard_bytes: int = 32 * 1024 * 1024,
+                 connect_timeout: float = 30.0) -> None:
+        self.nodes = nodes
+        self.retries = retries
+        self.shard_bytes = shard_bytes
+        self.connect_timeout = connect_timeout
+
+    def run(self, path: str, output: IO, fmt: str = 'jsonl',
+            shards: int = None) -> ShardReport:
+        """Обработать файл и записать сообщения в `output`."""
+        import queue
+        import threading
+        from multiprocessing.connection import Listener
+
+        shards = max(shards or self.nodes * 4,
+                     -(-os.path.getsize(path) // self.shard_bytes))
+        self._tasks = [(path, start, end, fmt)
+                       for start, end in split_shards(path, shards, fmt)]
+        self._pending = list(range(len(self._tasks)))
+        self._attempts = [0] * len(self._tasks)
+        self._results: Dict[int, tuple] = {}
+        self._busy: Dict[object, int] = {}
+        self._processes = []
+        self._connections = []
+        self._accepted = queue.Queue()
+        self._stopping = False
+        self._report = ShardReport(0, {}, 0)
+        self._next = 0
+        self._authkey = os.urandom(16)
+        with Listener(('127.0.0.1', 0), authkey=self._authkey) as listener:
+            self._listener = listener
+            acceptor = threading.Thread(target=self._accept, daemon=True)
+            acceptor.start()
+            try:
+                idle = [self._start_node() for _ in range(self.nodes)]
+                self._loop(idle, output)
+            finally:
+                self._stop()
+                acceptor.join(timeout=5)
+        return self._report
+
+    def _accept(self) -> None:
+        # `Listener.accept` не принимает таймаут, поэтому подключения
+        # принимаются в отдельном потоке, а `_start_node` ждёт их из
+        # очереди со сроком.
+        from multiprocessing import AuthenticationError
+
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                if self._stopping:
+                    return
+                continue
+            if self._stopping:
+                connection.close()
+                return
+            self._accepted.put(connection)
+
+    def _start_node(self):
+        import multiprocessing
+        import queue
+
+        for _ in range(self.retries + 1):
+            process = multiprocessing.Process(
+                target=_shard_worker,
+                args=(self._listener.address, self._authkey))
+            process.start()
+            self._processes.append(process)
+            try:
+                connection = self._accepted.get(timeout=self.connect_timeout)
+            except queue.Empty:
+                process.terminate()
+                self._report.retries += 1
+                continue
+            self._connections.append(connection)
+            return connection
+        raise RuntimeError('Узел не подключился к координатору за '
+                           f'{self.connect_timeout} с')
+
+    def _loop(self, idle: list, output: IO) -> None:
+        import heapq
+        from multiprocessing.connection import wait as wait_connections
+
+        window = 2 * self.nodes
+        while self._next < len(self._tasks):
+            # Диапазоны выдаются по возрастанию и не дальше `window`
+            # от ещё не выведенного, чтобы готовые результаты не
+            # копились в памяти за медленным диапазоном.
+            while idle and self._pending and (
+                    self._pending[0] < self._next + window):
+                index = heapq.heappop(self._pending)
+                connection = idle.pop()
+                connection.send((index, self._tasks[index]))
+                self._busy[connection] = index
+            for connection in wait_connections(list(self._busy)):
+                index = self._busy.pop(connection)
+                try:
+                    _, result, error = connection.recv()
+                except (EOFError, OSError):
+                    connection.close()
+                    self._retry(index, 'узел остановился')
+                    idle.append(self._start_node())
+                    continue
+                idle.append(connection)
+                if error is not None:
+                    self._retry(index, error)
+                else:
+                    self._results[index] = result
+            self._flush(output)
+        for connection in idle:
+            connection.send(None)
+
+    def _retry(self, index: int, reason: str) -> None:
+        import heapq
+
+        self._attempts[index] += 1
+        if self._attempts[index] > self.retries:
+            raise RuntimeError(f'Диапазон {index} не обработан: {reason}')
+        self._report.retries += 1
+        heapq.heappush(self._pending, index)
+
+    def _flush(self, output: IO) -> None:
+        while self._next in self._results:
+            messages, totals, skipped = self._results.pop(self._next)
+            if messages:
+                output.write('\n'.join(messages) + '\n')
+            self._report.packages += len(messages)
+            self._report.skipped += skipped
+            for training_type, values in totals.items():
+                merged = self._report.totals.setdefault(
+                    training_type, [0, 0.0, 0.0, 0.0])
+                for position, value in enumerate(values):
+                    merged[position] += value
+            self._next += 1
+
+    def _stop(self) -> None:
+        from multiprocessing.connection import Client
+
+        self._stopping = True
+        try:
+            # Разбудить поток `_accept`, ждущий в `Listener.accept`.
+            Client(self._listener.address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        for connection in self._connections:
+            connection.close()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+@lru_cache(maxsize=None)
+def _fingerprint_layout(workout_type: str,
+                        arity: int) -> Tuple[bytes, struct.Struct]:
+    code = workout_type.encode('utf-8')
+    return (struct.pack(f'<H{len(code)}sH', len(code), code, arity),
+            struct.Struct(f'<{arity}d'))
+
+
+def package_fingerprint(workout_type: str, data: Sequence[float]) -> int:
+    """64-битный отпечаток пакета, не зависящий от записи чисел.
+
+    Хешируются полный код тренировки, число полей и каждое поле как
+    double, поэтому `1206` и `1206.0` дают один отпечаток, а пакеты
+    разной длины или с разными длинными кодами — разные.
+    """
+    import hashlib
+
+    prefix, fields = _fingerprint_layout(workout_type, len(data))
+    digest = hashlib.blake2b(prefix + fields.pack(*data),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class BloomFilter:
+    """Фильтр Блума для 64-битных отпечатков.
+
+    Отвечает «точно нет» или «возможно да» с долей ложных срабатываний
+    около `error_rate` при заполнении до `capacity` элементов; `count`
+    показывает, сколько элементов уже добавлено.
+    """
+
+    def __init__(self, capacity: int = 1000000,
+                 error_rate: float = 0.01) -> None:
+        self.capacity = capacity
+        self.count = 0
+        self.size = max(8, int(-capacity * math.log(error_rate)
+                               / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, fingerprint: int) -> None:
+        """Добавить отпечаток."""
+        bits = self.bits
+        size = self.size
+        low = fingerprint & 0xFFFFFFFF
+        high = (fingerprint >> 32) | 1
+        for index in range(self.hashes):
+            position = (low + index * high) % size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, fingerprint: int) -> bool:
+        # Позиции считаются по одной: для отсутствующего отпечатка
+        # проверка обычно заканчивается на первом-втором бите.
+        bits = self.bits
+        size = self.size
+        low = fingerprint & 0xFFFFFFFF
+        high = (fingerprint >> 32) | 1
+        for index in range(self.hashes):
+            position = (low + index * high) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class DedupIndex:
+    """Постоянный индекс уже обработанных пакетов на SQLite.
+
+    Перед базой стоит фильтр Блума в памяти: новый пакет (частый
+    случай) отсеивается без обращения к диску, а его отпечаток копится
+    в буфере и записывается в базу одним `executemany` при `commit`
+    (автоматически каждые `commit_every` новых пакетов). Индекс
+    переживает перезапуск: фильтр восстанавливается из базы при
+    открытии с запасом вдвое от числа записей и перестраивается вдвое
+    большим, когда заполняется. При заданном `ttl` отпечатки старше
+    `ttl` секунд считаются истёкшими и удаляются `compact`.
+    """
+
+    def __init__(self, path: str, ttl: float = None,
+                 capacity: int = 1000000, error_rate: float = 0.01,
+                 commit_every: int = 10000,
+                 clock: Callable[[], float] = time.time) -> None:
+        import sqlite3
+
+        self.ttl = ttl
+        self.commit_every = commit_every
+        self._capacity = capacity
+        self._error_rate = error_rate
+        self._clock = clock
+        self._pending: Dict[int, float] = {}
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen ('
+                         'fingerprint INTEGER PRIMARY KEY, seen_at REAL)')
+        self._load_filter()
+
+    def _load_filter(self, capacity: int = 0) -> None:
+        count = self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+        self._filter = BloomFilter(max(self._capacity, capacity, 2 * count),
+                                   self._error_rate)
+        for (fingerprint,) in self._db.execute(
+                'SELECT fingerprint FROM seen'):
+            self._filter.add(fingerprint)
+
+    def __enter__(self) -> 'DedupIndex':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _seen_at(self, fingerprint: int) -> float:
+        seen_at = self._pending.get(fingerprint)
+        if seen_at is None:
+            row = self._db.execute(
+                'SELECT seen_at FROM seen WHERE fingerprint = ?',
+                (fingerprint,)).fetchone()
+            seen_at = row and row[0]
+        return seen_at
+
+    def add(self, workout_type: str, data: Sequence[float]) -> bool:
+        """Отметить пакет. Возвращает False, если он уже встречался."""
+        fingerprint = package_fingerprint(workout_type, data)
+        now = self._clock()
+        if fingerprint in self._filter:
+            seen_at = self._seen_at(fingerprint)
+            if seen_at is not None and (self.ttl is None
+                                        or seen_at > now - self.ttl):
+                return False
+        self._pending[fingerprint] = now
+        self._filter.add(fingerprint)
+        if len(self._pending) >= self.commit_every:
+            self.commit()
+        if self._filter.count > self._filter.capacity:
+            self.commit()
+            self._load_filter(2 * self._filter.capacity)
+        return True
+
+    def filter_new(self, packages: Iterable[Tuple[str, list]]
+                   ) -> Iterator[Tuple[str, list]]:
+        """Пропустить только пакеты, которых ещё не было в индексе."""
+        for workout_type, data in packages:
+            if self.add(workout_type, data):
+                yield workout_type, data
+        self.commit()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._db.executemany('INSERT OR REPLACE INTO seen VALUES (?, ?)',
+                                 self._pending.items())
+            self._pending.clear()
+
+    def commit(self) -> None:
+        """Сохранить добавленные отпечатки на диск."""
+        self._flush()
+        self._db.commit()
+
+    def compact(self) -> int:
+        """Удалить истёкшие отпечатки и сжать базу.
+
+        Возвращает число удалённых записей.
+        """
+        self._flush()
+        removed = 0
+        if self.ttl is not None:
+            removed = self._db.execute(
+                'DELETE FROM seen WHERE seen_at <= ?',
+                (self._clock() - self.ttl,)).rowcount
+        self.commit()
+        self._db.execute('VACUUM')
+        self._load_filter()
+        return removed
+
+    def __len__(self) -> int:
+        self._flush()
+        return self._db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def close(self) -> None:
+        """Сохранить изменения и закрыть базу."""
+        self.commit()
+        self._db.close()
+
+
+class TrainingAggregator:
+    """Накопительные итоги тренировок по спортсменам в окнах времени.
+
+    Каждое событие обновляет итоги окна за O(1). Хранятся только
+    последние `retention` окон: более старые вытесняются при появлении
+    новых, а опоздавшие за их пределы события отбрасываются.
+    """
+    WINDOWS: Dict[str, Tuple[int, int]] = {
+        # Длина окна и сдвиг в секундах; 1970-01-01 — четверг,
+        # поэтому недели сдвигаются на три дня, чтобы начинаться
+        # с понедельника.
+        'day': (86400, 0),
+        'week': (7 * 86400, 3 * 86400),
+    }
+    TOTALS: Tuple[str, ...] = ('count', 'duration', 'distance',
+                               'calories', 'speed_time')
+
+    def __init__(self, window: str = 'day', retention: int = 30) -> None:
+        if window not in self.WINDOWS:
+            raise ValueError(f'Неизвестное окно: {window}')
+        self.window = window
+        self.retention = retention
+        self._size, self._offset = self.WINDOWS[window]
+        self._totals: Dict[Tuple[str, int, str], list] = {}
+        self._keys: Dict[int, List[Tuple[str, int, str]]] = {}
+        self._heap: List[int] = []
+        self._types: set = set()
+        self._latest: int = None
+
+    def bucket(self, timestamp: float) -> int:
+        """Номер окна для времени `timestamp` (секунды Unix)."""
+        return int((timestamp + self._offset) // self._size)
+
+    def add(self, athlete: str, timestamp: float,
+            info: InfoMessage) -> bool:
+        """Учесть тренировку. Возвращает False для отброшенного события."""
+        import heapq
+
+        bucket = self.bucket(timestamp)
+        if self._latest is not None:
+            if bucket <= self._latest - self.retention:
+                return False
+        key = (athlete, bucket, info.training_type)
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._totals[key] = [0, 0.0, 0.0, 0.0, 0.0]
+            self._types.add(info.training_type)
+            if bucket not in self._keys:
+                self._keys[bucket] = []
+                heapq.heappush(self._heap, bucket)
+            self._keys[bucket].append(key)
+        totals[0] += 1
+        totals[1] += info.duration
+        totals[2] += info.distance
+        totals[3] += info.calories
+        totals[4] += info.speed * info.duration
+        if self._latest is None or bucket > self._latest:
+            self._latest = bucket
+            self._evict()
+        return True
+
+    def _evict(self) -> None:
+        import heapq
+
+        limit = self._latest - self.retention
+        while self._heap and self._heap[0] <= limit:
+            for key in self._keys.pop(heapq.heappop(self._heap)):
+                del self._totals[key]
+
+    def get(self, athlete: str, timestamp: float,
+            training_type: str = None) -> Dict[str, float]:
+        """Итоги спортсмена за окно, содержащее `timestamp`.
+
+        Без `training_type` итоги суммируются по всем типам тренировок.
+        Средняя скорость взвешена по длительности тренировок.
+        """
+        bucket = self.bucket(timestamp)
+        types = self._types if training_type is None else (training_type,)
+        result = dict.fromkeys(self.TOTALS, 0)
+        for name in types:
+            totals = self._totals.get((athlete, bucket, name))
+            if totals is None:
+                continue
+            for total, value in zip(self.TOTALS, totals):
+                result[total] += value
+        speed_time = result.pop('speed_time')
+        result['mean_speed'] = (speed_time / result['duration']
+                                if result['duration'] else 0.0)
+        return result
+
+    def snapshot(self) -> dict:
+        """Сохранить состояние в виде словаря, пригодного для JSON."""
+        return {'window': self.window,
+                'retention': self.retention,
+                'latest': self._latest,
+                'totals': [list(key) + totals
+                           for key, totals in self._totals.items()]}
+
+    @classmethod
+    def restore(cls, state: dict) -> 'TrainingAggregator':
+        """Восстановить агрегатор из `snapshot`."""
+        import heapq
+
+        aggregator = cls(state['window'], state['retention'])
+        for athlete, bucket, training_type, *totals in state['totals']:
+            key = (athlete, bucket, training_type)
+            aggregator._totals[key] = totals
+            aggregator._types.add(training_type)
+            if bucket not in aggregator._keys:
+                aggregator._keys[bucket] = []
+                heapq.heappush(aggregator._heap, bucket)
+            aggregator._keys[bucket].append(key)
+        aggregator._latest = state['latest']
+        return aggregator
+
+
+class QuantileSketch:
+    """Потоковая оценка квантилей (DDSketch).
+
+    Любой квантиль возвращается с относительной ошибкой не больше
+    `relative_accuracy`, память растёт логарифмически от диапазона
+    значений. Эскизы с одинаковой точностью объединяются `merge`.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01) -> None:
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.count = 0
+        self.zero = 0
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        """Учесть одно значение."""
+        self.count += 1
+        if value > 1e-12:
+            key = math.ceil(math.log(value) / self._log_gamma)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < -1e-12:
+            key = math.ceil(math.log(-value) / self._log_gamma)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero += 1
+
+    def update(self, values: Iterable[float]) -> None:
+        """Учесть пакет значений, например столбец `compute_batch`."""
+        for value in values:
+            self.add(value)
+
+    def _value(self, key: int) -> float:
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля `q` из [0, 1]."""
+        if not self.count:
+            raise ValueError('Эскиз пуст')
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Добавить данные другого эскиза с той же точностью."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Точность эскизов должна совпадать')
+        self.count += other.count
+        self.zero += other.zero
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+
+
+class HyperLogLog:
+    """Оценка числа различных значений (HyperLogLog).
+
+    Стандартная ошибка около `1.04 / sqrt(2 ** precision)`. Хеш не
+    зависит от процесса, поэтому эскизы из разных процессов можно
+    объединять `merge`.
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item: object) -> None:
+        """Учесть значение; значения сравниваются по `str(item)`."""
+        import hashlib
+
+        digest = hashlib.blake2b(str(item).encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> float:
+        """Оценка числа различных значений."""
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(
+            2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            return size * math.log(size / zeros)
+        return estimate
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        """Добавить данные другого эскиза той же точности."""
+        if other.precision != self.precision:
+            raise ValueError('Точность эскизов должна совпадать')
+        self.registers = bytearray(
+            map(max, self.registers, other.registers))
+
+
+class MetricSketches:
+    """Эскизы скорости, калорий и числа спортсменов по типам тренировок."""
+    METRICS: Tuple[str, ...] = ('speed', 'calories')
+
+    def __init__(self, relative_accuracy: float = 0.01,
+                 precision: int = 14) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.precision = precision
+        self.quantiles: Dict[Tuple[str, str], QuantileSketch] = {}
+        self.athletes: Dict[str, HyperLogLog] = {}
+
+    def _quantile_sketch(self, training_type: str,
+                         metric: str) -> QuantileSketch:
+        sketch = self.quantiles.get((training_type, metric))
+        if sketch is None:
+            sketch = self.quantiles[(training_type, metric)] = (
+                QuantileSketch(self.relative_accuracy))
+        return sketch
+
+    def _athlete_sketch(self, training_type: str) -> HyperLogLog:
+        if training_type not in self.athletes:
+            self.athletes[training_type] = HyperLogLog(self.precision)
+        return self.athletes[training_type]
+
+    def add(self, info: InfoMessage, athlete: object = None) -> None:
+        """Учесть одно сообщение о тренировке."""
+        for metric in self.METRICS:
+            self._quantile_sketch(info.training_type, metric).add(
+                getattr(info, metric))
+        if athlete is not None:
+            self._athlete_sketch(info.training_type).add(athlete)
+
+    def add_batch(self, workout_type: str,
+                  metrics: Mapping[str, Iterable[float]],
+                  athletes: Iterable[object] = ()) -> None:
+        """Учесть результат `compute_batch` для кода тренировки."""
+        training_type = get_workout_class(workout_type).__name__
+        for metric in self.METRICS:
+            self._quantile_sketch(training_type, metric).update(
+                metrics[metric])
+        sketch = None
+        for athlete in athletes:
+            sketch = sketch or self._athlete_sketch(training_type)
+            sketch.add(athlete)
+
+    def quantile(self, training_type: str, metric: str,
+                 q: float) -> float:
+        """Оценка квантиля метрики для типа тренировки."""
+        return self.quantiles[(training_type, metric)].quantile(q)
+
+    def distinct_athletes(self, training_type: str = None) -> float:
+        """Оценка числа различных спортсменов, всего или по типу."""
+        if training_type is not None:
+            return self.athletes[training_type].count()
+        combined = HyperLogLog(self.precision)
+        for sketch in self.athletes.values():
+            combined.merge(sketch)
+        return combined.count()
+
+    def merge(self, other: 'MetricSketches') -> None:
+        """Добавить эскизы, собранные в другом процессе."""
+        for (training_type, metric), sketch in other.quantiles.items():
+            self._quantile_sketch(training_type, metric).merge(sketch)
+        for training_type, sketch in other.athletes.items():
+            self._athlete_sketch(training_type).merge(sketch)
+
+
+class Instrumentation:
+    """Счётчики и гистограммы задержек по операциям и типам тренировок."""
+    BUCKETS: Tuple[float, ...] = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5,
+                                  1e-4, 1e-3, 1e-2)
+
+    def __init__(self) -> None:
+        import threading
+
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], list] = {}
+
+    def observe(self, operation: str, label: str, seconds: float) -> None:
+        """Учесть один вызов операции длительностью `seconds`."""
+        from bisect import bisect_left
+
+        with self._lock:
+            series = self._series.get((operation, label))
+            if series is None:
+                series = self._series[(operation, label)] = [
+                    0, 0.0, [0] * (len(self.BUCKETS) + 1)]
+            series[0] += 1
+            series[1] += seconds
+            series[2][bisect_left(self.BUCKETS, seconds)] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        """Вернуть копию метрик: операция -> тип тренировки -> значения."""
+        with self._lock:
+            result: Dict[str, Dict[str, dict]] = {}
+            for (operation, label), series in self._series.items():
+                count, total, buckets = series
+                result.setdefault(operation, {})[label] = {
+                    'count': count, 'seconds': total,
+                    'buckets': list(buckets)}
+            return result
+
+    def to_prometheus(self) -> str:
+        """Вернуть метрики в текстовом формате Prometheus."""
+        name = 'homework_operation_seconds'
+        lines = [f'# TYPE {name} histogram']
+        for operation, labels in sorted(self.snapshot().items()):
+            for label, values in sorted(labels.items()):
+                tags = f'operation="{operation}",workout="{label}"'
+                cumulative = 0
+                bounds = [str(bound) for bound in self.BUCKETS] + ['+Inf']
+                for bound, count in zip(bounds, values['buckets']):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket{{{tags},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{tags}}} {values["seconds"]}')
+                lines.append(f'{name}_count{{{tags}}} {values["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+_INSTRUMENTED: Dict[str, Callable] = {}
+
+
+def enable_instrumentation() -> Instrumentation:
+    """Обернуть горячие функции замерами времени.
+
+    Замеряются путь одного объекта (`read_package`, `show_training_info`,
+    `get_message`) и пакетный расчёт `compute_batch`, через который
+    идут `process_packages` и сервер. Расчёт в других процессах
+    (пул `run_parallel`, узлы `ShardCoordinator`) не учитывается.
+    Пока инструментирование выключено, функции модуля не обёрнуты
+    и не тратят время на замеры. Метка `workout` у всех операций —
+    код тренировки (`WLK`), а для незарегистрированного класса — его имя.
+    """
+    global read_package, compute_batch
+    disable_instrumentation()
+    instrumentation = Instrumentation()
+    observe = instrumentation.observe
+    clock = time.perf_counter
+    original_read = read_package
+    original_show = Training.show_training_info
+    original_message = InfoMessage.get_message
+    original_batch = compute_batch
+    _INSTRUMENTED.update(read_package=original_read,
+                         show_training_info=original_show,
+                         get_message=original_message,
+                         compute_batch=original_batch)
+    codes: Dict[str, str] = {}
+
+    def workout_code(training_type: str) -> str:
+        code = codes.get(training_type)
+        if code is None:
+            code = next((code for code, training_class
+                         in WORKOUT_TYPES.items()
+                         if training_class.__name__ == training_type),
+                        training_type)
+            codes[training_type] = code
+        return code
+
+    @wraps(original_read)
+    def timed_read_package(workout_type: str, data: list) -> Training:
+        start = clock()
+        training = original_read(workout_type, data)
+        observe('read_package', workout_type, clock() - start)
+        return training
+
+    @wraps(original_show)
+    def timed_show_training_info(self: Training) -> InfoMessage:
+        start = clock()
+        info = original_show(self)
+        observe('show_training_info', workout_code(type(self).__name__),
+                clock() - start)
+        return info
+
+    @wraps(original_message)
+    def timed_get_message(self: InfoMessage) -> str:
+        start = clock()
+        message = original_message(self)
+        observe('get_message', workout_code(self.training_type),
+                clock() - start)
+        return message
+
+    @wraps(original_batch)
+    def timed_compute_batch(workout_type: str,
+                            columns: Mapping[str, Sequence[float]],
+                            precision: str = 'float64') -> Dict:
+        start = clock()
+        result = original_batch(workout_type, columns, precision)
+        observe('compute_batch', workout_type, clock() - start)
+        return result
+
+    read_package = timed_read_package
+    compute_batch = timed_compute_batch
+    Training.show_training_info = timed_show_training_info
+    InfoMessage.get_message = timed_get_message
+    return instrumentation
+
+
+def disable_instrumentation() -> None:
+    """Вернуть исходные функции без замеров."""
+    global read_package, compute_batch
+    if not _INSTRUMENTED:
+        return
+    read_package = _INSTRUMENTED.pop('read_package')
+    compute_batch = _INSTRUMENTED.pop('compute_batch')
+    Training.show_training_info = _INSTRUMENTED.pop('show_training_info')
+    InfoMessage.get_message = _INSTRUMENTED.pop('get_message')
+
+
+def main(training: Training, sink: OutputSink = None) -> None:
     """Главная функция."""
     info = training.show_training_info()
-    print(info.get_message())
+    if sink is None:
+        sink = STDOUT_SINK
+    sink.write(info.get_message())
 
 
-if __name__ == '__main__':
-    packages = [
-        ('SWM', [720, 1, 80, 25, 40]),
-        ('RUN', [15000, 1, 75]),
-        ('WLK', [9000, 1, 75, 180]),
-    ]
+def parse_args(argv: Sequence[str] = None) -> 'argparse.Namespace':
+    """Разобрать аргументы командной строки."""
+    import argparse
 
-    for workout_type, data in packages:
-        training = read_package(workout_type, data)
-        main(training)
+    parser = argparse.ArgumentParser(
+        description='Расчёт информации о тренировках по данным датчиков.')
+    parser.add_argument('source', nargs='?',
+                        help='файл с пакетами или `-` для stdin')
+    parser.add_argument('--format', choices=FORMATS, default='jsonl',
+                        help='формат входных пакетов')
+    parser.add_argument('--chunk-size', type=int, default=1024,
+                        help='количество сообщений в одной записи вывода')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='число процессов для параллельного расчёта')
+    parser.add_argument('--nodes', type=int, default=0,
+                        help='обработать файл распределённо на стольких '
+                             'узлах-процессах')
+    parser.add_argument('--dedup', metavar='PATH',
+                        help='пропускать пакеты, уже записанные в индекс '
+                             'SQLite по этому пути')
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help='размер LRU-кеша повторяющихся пакетов')
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help='принимать пакеты JSON Lines на host:port '
+                             'или Unix-сокете')
+    parser.add_argument('--connect', metavar='ADDRESS',
+                        help='передать пакеты запущенному серверу '
+                             '(--serve) вместо расчёта в этом процессе')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='число одновременно рассчитываемых '
+                             'микропакетов сервера')
+    parser.add_argument('--profile', action='store_true',
+                        help='вывести в stderr профиль cProfile')
+    parser.add_argument('--metrics', action='store_true',
+                        help='вывести в stderr метрики в формате '
+                             'Prometheus; расчёт в других процессах '
+                             '(--workers, --nodes, --connect) в них '
+                             'не попадает')
+    return parser.parse_args(argv)
+
+
+def run_cli(argv: Sequence[str] = None) -> None:
+    """Точка входа командной строки."""
+    args = parse_args(argv)
+    if args.metrics:
+        instrumentation = enable_instrumentation()
+    if args.profile:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.runcall(_run_command, args)
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.sort_stats('cumulative').print_stats(30)
+    else:
+        _run_command(args)
+    if args.metrics:
+        disable_instrumentation()
+        sys.stderr.write(instrumentation.to_prometheus())
+
+
+def _open_source(args: 'argparse.Namespace') -> IO:
+    mode = 'rb' if args.format == 'binary' else 'r'
+    if args.source == '-':
+        return sys.stdin.buffer if mode == 'rb' else sys.stdin
+    return open(args.source, mode)
+
+
+def _run_command(args: 'argparse.Namespace') -> None:
+    if args.serve:
+        import asyncio
+
+        asyncio.run(serve(args.serve, concurrency=args.concurrency,
+                          batch_size=args.chunk_size))
+        return
+    if args.source is None:
+        packages = [
+            ('SWM', [720, 1, 80, 25, 40]),
+            ('RUN', [15000, 1, 75]),
+            ('WLK', [9000, 1, 75, 180]),
+        ]
+
+        for workout_type, data in packages:
+            training = read_package(workout_type, data)
+            main(training)
+        return
+    if args.nodes:
+        report = ShardCoordinator(args.nodes).run(args.source, sys.stdout,
+                                                  args.format)
+        print(f'Обработано пакетов: {report.packages}, '
+              f'повторов: {report.retries}, '
+              f'пропущено некорректных: {report.skipped}', file=sys.stderr)
+        return
+    _run_source(args)
+
+
+def _run_source(args: 'argparse.Namespace') -> None:
+    stream = _open_source(args)
+    index = DedupIndex(args.dedup) if args.dedup else None
+    try:
+        stats = StreamStats(0, 0.0)
+        packages = iter_packages(stream, args.format, stats)
+        if index is not None:
+            packages = index.filter_new(packages)
+        cache = None
+        if args.connect:
+            send_packages(args.connect, packages, sys.stdout)
+        else:
+            if args.cache_size:
+                cache = PackageCache(args.cache_size)
+            run_stream(packages, sys.stdout, args.chunk_size, args.workers,
+                       cache, stats)
+    finally:
+        if index is not None:
+            index.close()
+        if args.source != '-':
+            stream.close()
+    if cache is not None:
+        print(f'Кеш: {cache.stats}', file=sys.stderr)
+    if not args.connect:
+        print(f'Обработано пакетов: {stats.packages} '
+              f'за {stats.seconds:.3f} с ({stats.rate:.0f} пакетов/с)',
+              file=sys.stderr)
+    if stats.skipped:
+        print(f'Пропущено некорректных пакетов: {stats.skipped}',
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    run_cli()
@@ -1,4 +1,6 @@
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from io import StringIO
 
@@ -25,3 +27,38 @@ class Capturing(list):
         self.extend(self._stringio.getvalue().splitlines())
         del self._stringio  # free up some memory
         sys.stdout = self._stdout
+
+
+class EngineTimings(dict):
+    """
+    Accumulates per-engine timings of the differential tests.
+    Usage:
+     with ENGINE_TIMINGS.measure('engine', rows):
+         engine()
+
+    the summary is printed at the end of the pytest session
+    """
+
+    @contextmanager
+    def measure(self, engine, rows):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        total = self.setdefault(engine, [0, 0.0])
+        total[0] += rows
+        total[1] += elapsed
+
+
+ENGINE_TIMINGS = EngineTimings()
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not ENGINE_TIMINGS:
+        return
+    terminalreporter.section('engine timings')
+    terminalreporter.write_line(
+        f'{"engine":<20}{"rows":>10}{"total, ms":>12}{"ns/row":>10}')
+    for engine, (rows, elapsed) in sorted(ENGINE_TIMINGS.items()):
+        terminalreporter.write_line(
+            f'{engine:<20}{rows:>10}{elapsed * 1e3:>12.1f}'
+            f'{elapsed * 1e9 / max(rows, 1):>10.0f}')
@@ -0,0 +1,157 @@
+import math
+from io import BytesIO, StringIO
+
+import pytest
+from conftest import ENGINE_TIMINGS
+
+hypothesis = pytest.importorskip('hypothesis')
+from hypothesis import given, settings, strategies as st  # noqa: E402
+
+import homework  # noqa: E402
+
+# Диапазоны допустимых значений полей пакета. Для полей плагинов,
+# которых здесь нет, используется `DEFAULT_FIELD`.
+FIELD_STRATEGIES = {
+    'action': st.integers(0, 50000),
+    'duration': st.floats(0.1, 10),
+    'weight': st.floats(20, 200),
+    'height': st.floats(100, 250),
+    'length_pool': st.floats(10, 100),
+    'count_pool': st.integers(0, 200),
+}
+DEFAULT_FIELD = st.floats(0.1, 1000)
+
+
+def packages_for(workout_type, max_size=50):
+    """Стратегия списка годных пакетов данных для типа тренировки."""
+    training_class = homework.get_workout_class(workout_type)
+    row = st.tuples(*[FIELD_STRATEGIES.get(name, DEFAULT_FIELD)
+                      for name in training_class.FIELDS]).map(list)
+    return st.lists(row, min_size=1, max_size=max_size)
+
+
+def _columns(workout_type, rows):
+    training_class = homework.get_workout_class(workout_type)
+    return dict(zip(training_class.FIELDS, zip(*rows)))
+
+
+def _reference(workout_type, rows):
+    return [homework.read_package(workout_type, data).compute_metrics()
+            for data in rows]
+
+
+def _calculate(workout_type, rows):
+    training_class = homework.get_workout_class(workout_type)
+    return [training_class.calculate(*data) for data in rows]
+
+
+def _kernel(workout_type, rows):
+    kernel = homework.get_kernel(homework.get_workout_class(workout_type))
+    return [kernel(*data) for data in rows]
+
+
+def _batch(workout_type, rows, precision='float64'):
+    result = homework.compute_batch(workout_type,
+                                    _columns(workout_type, rows), precision)
+    return list(zip(*(result[name] for name in homework.METRICS)))
+
+
+def _batch_float32(workout_type, rows):
+    return _batch(workout_type, rows, 'float32')
+
+
+def _process_packages(workout_type, rows):
+    messages = homework.process_packages(
+        [(workout_type, data) for data in rows])
+    return [(info.distance, info.speed, info.calories) for info in messages]
+
+
+def _cache(workout_type, rows):
+    cache = homework.PackageCache()
+    for data in rows:
+        cache.get_info(workout_type, data)
+    messages = [cache.get_info(workout_type, data) for data in rows]
+    return [(info.distance, info.speed, info.calories) for info in messages]
+
+
+def _binary(workout_type, rows):
+    stream = BytesIO()
+    homework.write_records([(workout_type, data) for data in rows], stream)
+    stream.seek(0)
+    return [homework.read_package(*package).compute_metrics()
+            for package in homework.iter_packages(stream, 'binary')]
+
+
+# Движок: (функция, допустимая относительная ошибка).
+ENGINES = {
+    'calculate': (_calculate, 1e-12),
+    'kernel': (_kernel, 1e-12),
+    'compute_batch': (_batch, 1e-12),
+    'compute_batch_f32': (_batch_float32, 1e-6),
+    'process_packages': (_process_packages, 1e-12),
+    'package_cache': (_cache, 0),
+    'binary_records': (_binary, 0),
+}
+
+
+def _near_integer(value, rel):
+    return abs(value - round(value)) <= rel * max(abs(value), 1)
+
+
+def assert_metrics_close(workout_type, data, expected, actual, rel):
+    """Сравнить метрики с эталоном с учётом вычитания в формулах калорий.
+
+    Слагаемые калорий порядка `weight * duration * MINUTES_IN_HOUR`
+    могут почти полностью взаимно вычитаться, поэтому ошибка калорий
+    отсчитывается от большего из результата и этого масштаба.
+    """
+    training_class = homework.get_workout_class(workout_type)
+    distance, speed, calories = expected
+    assert actual[0] == pytest.approx(distance, rel=rel, abs=0), (
+        f'Дистанция расходится с эталоном для {workout_type} {data}.'
+    )
+    assert actual[1] == pytest.approx(speed, rel=rel, abs=0), (
+        f'Скорость расходится с эталоном для {workout_type} {data}.'
+    )
+    if rel and issubclass(training_class, homework.SportsWalking) and (
+            _near_integer(speed ** 2 / data[3], rel)):
+        # Целая часть speed ** 2 // height может сдвинуться на 1.
+        return
+    scale = max(abs(calories), data[1] * data[2]
+                * training_class.MINUTES_IN_HOUR)
+    assert math.isclose(actual[2], calories, rel_tol=0,
+                        abs_tol=rel * scale), (
+        f'Калории расходятся с эталоном для {workout_type} {data}.'
+    )
+
+
+@pytest.mark.parametrize('engine', sorted(ENGINES))
+@pytest.mark.parametrize('workout_type', sorted(homework.WORKOUT_TYPES))
+@settings(max_examples=100, deadline=None)
+@given(data=st.data())
+def test_engine_matches_reference(workout_type, engine, data):
+    rows = data.draw(packages_for(workout_type))
+    function, rel = ENGINES[engine]
+    with ENGINE_TIMINGS.measure('reference', len(rows)):
+        expected = _reference(workout_type, rows)
+    with ENGINE_TIMINGS.measure(engine, len(rows)):
+        actual = function(workout_type, rows)
+    assert len(actual) == len(expected)
+    for row, metrics, reference in zip(rows, actual, expected):
+        assert_metrics_close(workout_type, row, reference, metrics, rel)
+
+
+@pytest.mark.parametrize('workout_type', sorted(homework.WORKOUT_TYPES))
+@settings(max_examples=50, deadline=None)
+@given(data=st.data())
+def test_stream_messages_match_reference(workout_type, data):
+    rows = data.draw(packages_for(workout_type, max_size=20))
+    packages = [(workout_type, row) for row in rows]
+    expected = [homework.read_package(*package)
+                .show_training_info().get_message() for package in packages]
+    output = StringIO()
+    with ENGINE_TIMINGS.measure('run_stream_cached', len(rows)):
+        homework.run_stream(packages, output, cache=homework.PackageCache())
+    assert output.getvalue().splitlines() == expected, (
+        'Сообщения потоковой обработки должны совпадать с эталонными.'
+    )
@@ -1,7 +1,17 @@
 import pytest
 import types
 import inspect
-from conftest import Capturing
+import asyncio
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+from dataclasses import fields
+from io import BytesIO, StringIO
+from conftest import BASE_DIR, Capturing
 
 try:
     import homework
@@ -384,3 +394,988 @@ def test_main_output(input_data, expected):
     assert get_message_output == expected, (
         'Метод `main` должен печатать результат в консоль.\n'
     )
+
+
+@pytest.mark.parametrize('workout_type, rows', [
+    ('SWM', [[720, 1, 80, 25, 40], [420, 4, 20, 42, 4],
+             [1206, 12, 6, 12, 6]]),
+    ('RUN', [[9000, 1, 75], [420, 4, 20], [1206, 12, 6]]),
+    ('WLK', [[9000, 1, 75, 180], [420, 4, 20, 42], [1206, 12, 6, 12]]),
+])
+def test_compute_batch(workout_type, rows):
+    training_class = homework.WORKOUT_TYPES[workout_type]
+    columns = dict(zip(training_class.FIELDS, zip(*rows)))
+    result = homework.compute_batch(workout_type, columns)
+    for index, row in enumerate(rows):
+        training = homework.read_package(workout_type, row)
+        assert result['distance'][index] == training.get_distance(), (
+            'Дистанция `compute_batch` должна совпадать с `get_distance`.'
+        )
+        assert result['speed'][index] == training.get_mean_speed(), (
+            'Скорость `compute_batch` должна совпадать с `get_mean_speed`.'
+        )
+        assert result['calories'][index] == training.get_spent_calories(), (
+            'Калории `compute_batch` должны совпадать '
+            'с `get_spent_calories`.'
+        )
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def batch_engine(request, monkeypatch):
+    """Запустить тест с NumPy и с запасным расчётом на чистом Python."""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(homework, '_numpy', lambda: None)
+    return request.param
+
+
+@pytest.mark.parametrize('workout_type, row', [
+    ('WLK', [1e200, 1e-100, 75, 180]),
+    ('RUN', [1e200, 1e-200, 75]),
+    ('SWM', [720, 0, 80, 25, 40]),
+])
+def test_compute_batch_overflow(batch_engine, workout_type, row):
+    training_class = homework.WORKOUT_TYPES[workout_type]
+    columns = dict(zip(training_class.FIELDS, zip(row)))
+    with pytest.raises(ArithmeticError):
+        homework.compute_batch(workout_type, columns)
+
+
+def test_compute_batch_unknown_type():
+    with pytest.raises(ValueError):
+        homework.compute_batch('XXX', {})
+
+
+MAIN_OUTPUT = [
+    'Тип тренировки: Swimming; '
+    'Длительность: 1.000 ч.; '
+    'Дистанция: 0.994 км; '
+    'Ср. скорость: 1.000 км/ч; '
+    'Потрачено ккал: 336.000.',
+    'Тип тренировки: Running; '
+    'Длительность: 12.000 ч.; '
+    'Дистанция: 0.784 км; '
+    'Ср. скорость: 0.065 км/ч; '
+    'Потрачено ккал: -81.320.',
+    'Тип тренировки: SportsWalking; '
+    'Длительность: 1.000 ч.; '
+    'Дистанция: 5.850 км; '
+    'Ср. скорость: 5.850 км/ч; '
+    'Потрачено ккал: 157.500.',
+]
+PACKAGES = [
+    ('SWM', [720, 1, 80, 25, 40]),
+    ('RUN', [1206, 12, 6]),
+    ('WLK', [9000, 1, 75, 180]),
+]
+
+
+@pytest.mark.parametrize('fmt, content', [
+    ('jsonl', '["SWM", [720, 1, 80, 25, 40]]\n'
+              '{"workout_type": "RUN", "data": [1206, 12, 6]}\n'
+              '\n'
+              '["WLK", [9000, 1, 75, 180]]\n'),
+    ('csv', 'SWM,720,1,80,25,40\nRUN,1206,12,6\nWLK,9000,1,75,180\n'),
+])
+def test_run_stream_text(fmt, content):
+    output = StringIO()
+    packages = homework.iter_packages(StringIO(content), fmt)
+    stats = homework.run_stream(packages, output, chunk_size=2)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT, (
+        '`run_stream` должна выводить те же сообщения, что и `main`.'
+    )
+    assert stats.packages == 3
+    assert stats.rate >= 0
+
+
+def test_run_stream_binary():
+    records = b''.join(homework.pack_record(*package) for package in PACKAGES)
+    packages = list(homework.iter_packages(BytesIO(records), 'binary'))
+    assert [data for _, data in packages] == [data for _, data in PACKAGES]
+    output = StringIO()
+    homework.run_stream(packages, output)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT
+
+
+def test_iter_packages_truncated_binary(tmp_path):
+    records = b''.join(homework.pack_record(*package) for package in PACKAGES)
+    packages = homework.iter_packages(BytesIO(records[:-1]), 'binary')
+    with pytest.raises(ValueError):
+        list(packages)
+    path = tmp_path / 'packages.bin'
+    path.write_bytes(records[:-1])
+    with pytest.raises(ValueError):
+        homework.split_shards(str(path), 2, 'binary')
+
+
+@pytest.mark.parametrize('package', [
+    ('CYCLE', [1, 1, 1]),
+    ('БЕГ', [1, 1, 1]),
+    ('RUN', [1, 1, 1, 1, 1, 1]),
+])
+def test_pack_record_rejects_oversized(package):
+    with pytest.raises(ValueError):
+        homework.pack_record(*package)
+
+
+@pytest.mark.parametrize('cache, workers', [
+    (None, 0), (homework.PackageCache(), 0), (None, 2),
+])
+def test_run_stream_skips_bad_packages(cache, workers):
+    packages = [PACKAGES[0], ('RUN', [1000, 0, 75]), ('XXX', [1, 2, 3]),
+                ('WLK', [1e200, 1e-100, 75, 180]), *PACKAGES[1:]]
+    output = StringIO()
+    stats = homework.run_stream(packages, output, chunk_size=2,
+                                workers=workers, cache=cache)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT, (
+        'Некорректные пакеты должны пропускаться, не прерывая поток.'
+    )
+    assert (stats.packages, stats.skipped) == (3, 3)
+
+
+@pytest.mark.parametrize('fmt, content', [
+    ('jsonl', '["SWM", [720, 1, 80, 25, 40]]\nnot json\n{"data": []}\n'
+              '["RUN", [1206, 12, 6]]\n["WLK", [9000, 1, 75, 180]]\n'),
+    ('csv', 'SWM,720,1,80,25,40\nRUN,many,12,6\nRUN,1206,12,6\n'
+            'WLK,9000,1,75,180\n'),
+])
+def test_run_stream_skips_unparsable(fmt, content):
+    stats = homework.StreamStats(0, 0.0)
+    packages = homework.iter_packages(StringIO(content), fmt, stats)
+    output = StringIO()
+    homework.run_stream(packages, output, chunk_size=2, stats=stats)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT, (
+        'Неразборчивые строки должны пропускаться, не прерывая поток.'
+    )
+    assert stats.packages == 3
+    assert stats.skipped == content.count('\n') - 3
+    with pytest.raises(ValueError):
+        list(homework.iter_packages(StringIO(content), fmt))
+
+
+def test_run_stream_flushes_on_error():
+    def packages():
+        yield PACKAGES[0]
+        raise RuntimeError('обрыв источника')
+
+    output = StringIO()
+    sink = homework.BufferedSink(output, flush_size=100)
+    with pytest.raises(RuntimeError):
+        homework.run_stream(packages(), sink, chunk_size=1)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT[:1], (
+        'Рассчитанные сообщения должны выводиться и при ошибке.'
+    )
+
+
+def test_process_packages():
+    messages = homework.process_packages(PACKAGES)
+    assert [info.get_message() for info in messages] == MAIN_OUTPUT, (
+        '`process_packages` должна давать те же сообщения, что и `main`.'
+    )
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_run_parallel(ordered):
+    packages = PACKAGES * 5
+    result = list(homework.run_parallel(packages, workers=2, chunk_size=4,
+                                        ordered=ordered))
+    if ordered:
+        assert result == MAIN_OUTPUT * 5
+    else:
+        assert sorted(result) == sorted(MAIN_OUTPUT * 5)
+
+
+def test_training_slots():
+    for training_class in (homework.Running, homework.SportsWalking,
+                           homework.Swimming):
+        assert '__slots__' in training_class.__dict__, (
+            f'Класс `{training_class.__name__}` должен объявлять `__slots__`.'
+        )
+    running = homework.Running(9000, 1, 75)
+    assert 'action' not in vars(running), (
+        'Поля тренировки должны храниться в слотах, а не в `__dict__`.'
+    )
+
+
+def test_InfoMessage_labels_are_class_constants():
+    names = [field.name for field in fields(homework.InfoMessage)]
+    assert names == ['training_type', 'duration', 'distance', 'speed',
+                     'calories'], (
+        'Подписи `TEXT_*` должны быть константами класса `InfoMessage`.'
+    )
+
+
+def test_TrainingBatch():
+    batch = homework.TrainingBatch('RUN', [[9000, 1, 75], [420, 4, 20]])
+    batch.append([1206, 12, 6])
+    assert len(batch) == 3
+    with pytest.raises(TypeError):
+        batch.append([1, 2])
+    assert list(batch.compute()['calories']) == [
+        383.85, -90.1032, -81.32032799999999]
+
+
+def test_render_messages():
+    messages = homework.process_packages(PACKAGES)
+    output = homework.render_messages(messages)
+    assert output.getvalue() == '\n'.join(MAIN_OUTPUT) + '\n', (
+        '`render_messages` должна выводить сообщения построчно.'
+    )
+
+
+def test_Training_compute_metrics():
+    running = homework.Running(9000, 1, 75)
+    assert running.compute_metrics() == (5.85, 5.85, 383.85)
+    running.action = 420
+    running.duration = 4
+    running.weight = 20
+    assert running.compute_metrics() == (0.273, 0.06825, -90.1032), (
+        '`compute_metrics` должна учитывать изменение входных данных.'
+    )
+
+
+def test_Swimming_changed_fields():
+    swimming = homework.Swimming(720, 1, 80, 25, 40)
+    assert swimming.get_spent_calories() == 336.0
+    swimming.count_pool = 4
+    swimming.length_pool = 42
+    swimming.duration = 4
+    swimming.weight = 20
+    swimming.action = 420
+    assert swimming.get_mean_speed() == 0.042
+    assert swimming.get_spent_calories() == 45.68000000000001
+
+
+def test_compute_metrics_uses_get_spent_calories():
+    class Rowing(homework.Training):
+        def get_spent_calories(self):
+            return self.get_mean_speed() * self.weight
+
+    metrics = Rowing(1000, 2, 80).compute_metrics()
+    assert metrics == (0.65, 0.325, 26.0), (
+        'Класс без `_spent_calories` должен считать калории '
+        'через `get_spent_calories`.'
+    )
+
+
+def test_register_workout(monkeypatch):
+    monkeypatch.setattr(homework, 'WORKOUT_TYPES',
+                        dict(homework.WORKOUT_TYPES))
+    monkeypatch.setattr(homework, 'WORKOUT_ARITY',
+                        dict(homework.WORKOUT_ARITY))
+
+    @homework.register_workout('TRD')
+    class Treadmill(homework.Running):
+        LEN_STEP = 0.7
+
+    assert homework.WORKOUT_ARITY['TRD'] == 3
+    training = homework.read_package('TRD', [1000, 1, 70])
+    assert isinstance(training, Treadmill)
+    assert training.get_distance() == 0.7
+    with pytest.raises(ValueError):
+        homework.register_workout('RUN')(Treadmill)
+
+
+def test_instrumentation_batch():
+    original = homework.compute_batch
+    instrumentation = homework.enable_instrumentation()
+    try:
+        homework.process_packages(PACKAGES)
+    finally:
+        homework.disable_instrumentation()
+    assert homework.compute_batch is original
+    snapshot = instrumentation.snapshot()
+    assert snapshot['compute_batch']['RUN']['count'] == 1, (
+        'Пакетный расчёт тоже должен попадать в метрики.'
+    )
+
+
+def test_read_packages():
+    trainings = homework.read_packages(PACKAGES * 2)
+    assert [type(training).__name__ for training in trainings] == [
+        'Swimming', 'Running', 'SportsWalking'] * 2, (
+        '`read_packages` должна сохранять порядок пакетов.'
+    )
+    with pytest.raises(ValueError):
+        homework.read_packages([('XXX', [1, 1, 1])])
+
+
+def test_instrumentation():
+    original = homework.read_package
+    instrumentation = homework.enable_instrumentation()
+    try:
+        with Capturing() as output:
+            for package in PACKAGES:
+                homework.main(homework.read_package(*package))
+    finally:
+        homework.disable_instrumentation()
+    assert output == MAIN_OUTPUT, (
+        'Инструментирование не должно менять вывод `main`.'
+    )
+    assert homework.read_package is original, (
+        '`disable_instrumentation` должна вернуть исходные функции.'
+    )
+    snapshot = instrumentation.snapshot()
+    assert snapshot['read_package']['RUN']['count'] == 1
+    assert snapshot['show_training_info']['SWM']['count'] == 1
+    assert snapshot['get_message']['WLK']['count'] == 1, (
+        'Метка `workout` должна быть кодом тренировки во всех операциях.'
+    )
+    text = instrumentation.to_prometheus()
+    assert ('homework_operation_seconds_count{operation="read_package",'
+            'workout="WLK"} 1') in text
+
+
+def test_ingest_server():
+    async def scenario():
+        server = homework.IngestServer(concurrency=2, batch_size=2)
+        listener = await server.start()
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for workout_type, data in PACKAGES:
+            writer.write(json.dumps([workout_type, data]).encode() + b'\n')
+        writer.write(b'["XXX", [1, 1, 1]]\n')
+        writer.write_eof()
+        lines = (await reader.read()).decode().splitlines()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert lines[:3] == MAIN_OUTPUT, (
+        'Сервер должен возвращать сообщения в порядке пакетов.'
+    )
+    assert lines[3].startswith('ERROR:')
+
+
+@pytest.mark.parametrize('size', [110, 5000, 100000])
+def test_ingest_server_long_line(size):
+    async def scenario():
+        server = homework.IngestServer(batch_size=2, limit=1024)
+        listener = await server.start()
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        first, second, third = (json.dumps(package).encode() + b'\n'
+                                for package in PACKAGES)
+        writer.write(first)
+        writer.write(b'["RUN", [' + b' ' * size * 10 + b'1, 1, 1]]\n')
+        writer.write(second + third)
+        writer.write_eof()
+        lines = (await reader.read()).decode().splitlines()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert len(lines) == 4, (
+        'Сервер должен отвечать ровно одной строкой на каждую строку.'
+    )
+    assert lines[1].startswith('ERROR:'), (
+        'Строка длиннее лимита должна получать ERROR.'
+    )
+    assert lines[:1] + lines[2:] == MAIN_OUTPUT
+
+
+def test_render_lines_overflow(batch_engine):
+    lines = [json.dumps(package).encode() for package in PACKAGES]
+    lines.insert(1, b'["WLK", [1e200, 1e-100, 75, 180]]')
+    results = homework.render_lines(lines)
+    assert results[1].startswith('ERROR:'), (
+        'Переполнение в формуле должно давать ERROR для своей строки.'
+    )
+    assert results[:1] + results[2:] == MAIN_OUTPUT, (
+        'Годные строки микропакета должны рассчитываться как обычно.'
+    )
+
+
+def test_TrainingAggregator():
+    day = 86400
+    aggregator = homework.TrainingAggregator('day', retention=2)
+    run = homework.read_package('RUN', [9000, 1, 75]).show_training_info()
+    walk = homework.read_package(
+        'WLK', [9000, 1, 75, 180]).show_training_info()
+    assert aggregator.add('anna', 10, run)
+    assert aggregator.add('anna', 20, walk)
+    assert aggregator.add('ivan', 30, run)
+    totals = aggregator.get('anna', 0)
+    assert totals['count'] == 2
+    assert totals['distance'] == pytest.approx(11.7)
+    assert totals['calories'] == pytest.approx(383.85 + 157.5)
+    assert totals['mean_speed'] == pytest.approx(5.85)
+    assert aggregator.get('anna', 0, 'Running')['count'] == 1
+
+    restored = homework.TrainingAggregator.restore(
+        json.loads(json.dumps(aggregator.snapshot())))
+    assert restored.get('anna', 0) == totals, (
+        'Восстановленный агрегатор должен давать те же итоги.'
+    )
+
+    assert aggregator.add('anna', 2 * day, run)
+    assert aggregator.get('anna', 0)['count'] == 0, (
+        'Окна старше `retention` должны вытесняться.'
+    )
+    assert not aggregator.add('anna', 0, run), (
+        'Опоздавшие за пределы `retention` события отбрасываются.'
+    )
+    assert aggregator.get('anna', 2 * day)['count'] == 1
+
+
+def test_MappedPackages(tmp_path):
+    source = tmp_path / 'packages.jsonl'
+    source.write_text(''.join(json.dumps(package) + '\n'
+                              for package in PACKAGES * 3))
+    destination = tmp_path / 'packages.bin'
+    assert homework.convert_packages(str(source), str(destination)) == 9
+    with homework.MappedPackages(str(destination)) as packages:
+        assert len(packages) == 9
+        batches = list(packages.iter_batches(batch_size=4))
+        assert [len(batch) for batch in batches] == [4, 4, 1]
+        metrics = packages.compute()
+    assert list(metrics['RUN']['calories']) == [-81.32032799999999] * 3
+    assert list(metrics['SWM']['speed']) == [1.0] * 3
+    assert list(metrics['WLK']['distance']) == [5.85] * 3
+
+
+def test_MappedPackages_empty(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with homework.MappedPackages(str(path)) as packages:
+        assert len(packages) == 0
+        assert packages.compute() == {}
+
+
+def test_PackageCache():
+    cache = homework.PackageCache(maxsize=2)
+    for workout_type, data in PACKAGES + PACKAGES[2:]:
+        cache.get_message(workout_type, data)
+    assert cache.stats == homework.CacheStats(hits=1, misses=3,
+                                              evictions=1)
+    assert len(cache) == 2
+    info = cache.get_info('WLK', [9000, 1, 75, 180])
+    assert info.get_message() == MAIN_OUTPUT[2]
+    assert cache.get_message('RUN', (1206, 12, 6)) == MAIN_OUTPUT[1]
+
+
+def test_PackageCache_ttl():
+    now = [0.0]
+    cache = homework.PackageCache(ttl=10, clock=lambda: now[0])
+    cache.get_message('RUN', [1206, 12, 6])
+    now[0] = 5
+    cache.get_message('RUN', [1206, 12, 6])
+    now[0] = 20
+    assert cache.get_message('RUN', [1206, 12, 6]) == MAIN_OUTPUT[1]
+    assert cache.stats == homework.CacheStats(hits=1, misses=2,
+                                              expirations=1)
+
+
+def test_PackageCache_threads():
+    cache = homework.PackageCache(maxsize=2)
+    packages = PACKAGES * 200
+
+    def worker():
+        for workout_type, data in packages:
+            cache.get_message(workout_type, data)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats
+    assert stats.hits + stats.misses == len(packages) * 4
+    assert len(cache) == 2
+
+
+def test_validate_packages():
+    packages = PACKAGES + [
+        ('XXX', [1, 1, 1]),
+        ('RUN', [9000, 1]),
+        ('RUN', [9000, 0, 75]),
+        ('WLK', [9000, 1, 75, 0]),
+        ('SWM', [720, 1, 80, -25, 40]),
+        ('RUN', [9000, '1', 75]),
+        ('RUN', [9000, float('nan'), 75]),
+        'RUN',
+    ]
+    report = homework.validate_packages(packages)
+    assert report.mask == [True] * 3 + [False] * 8
+    assert report.valid == 3
+    assert sorted(report.errors) == list(range(3, 11))
+    assert report.select(packages) == PACKAGES
+
+
+def test_validate_packages_numeric_types():
+    from fractions import Fraction
+
+    packages = [('RUN', [9000, Fraction(1, 2), 75]), ('RUN', [9000, 1, True])]
+    assert homework.validate_packages(packages).mask == [True, False], (
+        'Числа `numbers.Real`, кроме bool, должны считаться годными.'
+    )
+    numpy = pytest.importorskip('numpy')
+    package = ('RUN', [numpy.int64(9000), numpy.float32(1), 75])
+    assert homework.validate_packages([package]).mask == [True]
+
+
+def test_validate_columns(batch_engine):
+    columns = {'action': [9000, 420, 1206, 100, 1, 1],
+               'duration': [1, 0, 12, 1, 1, 1],
+               'weight': [75, 20, 6, 70, 'тяжёлый', 70],
+               'height': [180, 42, float('inf'), -1, 180, None]}
+    mask = homework.validate_columns('WLK', columns)
+    assert [bool(ok) for ok in mask] == [True] + [False] * 5, (
+        'Нечисловые значения должны помечаться в маске, а не падать.'
+    )
+
+
+def test_validate_columns_lengths(batch_engine):
+    columns = {'action': [1], 'duration': [1, 1], 'weight': [1, 1]}
+    with pytest.raises(ValueError):
+        homework.validate_columns('RUN', columns)
+
+
+def test_CsvExportSink(tmp_path):
+    path = tmp_path / 'results.csv'
+    rows = [[9000, 1, 75], [420, 4, 20]]
+    columns = dict(zip(homework.Running.FIELDS, zip(*rows)))
+    metrics = homework.compute_batch('RUN', columns)
+    with homework.open_export_sink(str(path), row_group_size=2) as sink:
+        for info in homework.process_packages(PACKAGES):
+            sink.write(info)
+        sink.write_batch('RUN', columns, metrics)
+    assert sink.rows == 5
+    with open(path, newline='') as source:
+        table = list(csv.reader(source))
+    assert table[0] == list(homework.EXPORT_COLUMNS)
+    assert table[1] == ['Swimming', '1.0', '0.9935999999999999', '1.0',
+                        '336.0']
+    assert table[4] == ['Running', '1.0', '5.85', '5.85', '383.85']
+    assert len(table) == 6
+
+
+def test_ArrowExportSink(tmp_path):
+    pyarrow = pytest.importorskip('pyarrow')
+    path = tmp_path / 'results.arrow'
+    with homework.open_export_sink(str(path)) as sink:
+        for info in homework.process_packages(PACKAGES):
+            sink.write(info)
+    table = pyarrow.ipc.open_file(str(path)).read_all()
+    assert table.column('calories').to_pylist()[0] == 336.0
+
+
+def test_send_packages(tmp_path):
+    path = str(tmp_path / 'homework.sock')
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(homework.IngestServer().start(
+        path=path))
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        output = StringIO()
+        count = homework.send_packages(path, PACKAGES, output)
+    finally:
+        listener.close()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+    assert count == 3
+    assert output.getvalue().splitlines() == MAIN_OUTPUT, (
+        'Клиент должен выводить ответы сервера в порядке пакетов.'
+    )
+
+
+def test_lazy_imports():
+    code = ('import sys, homework; '
+            'print(sorted({"asyncio", "argparse", "numpy", '
+            '"concurrent.futures", "json", "hashlib", "mmap", '
+            '"threading", "heapq", "bisect", "numbers"} '
+            '& set(sys.modules)))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]', (
+        'Импорт `homework` не должен загружать тяжёлые модули.'
+    )
+
+
+def _random_package(rng, workout_type):
+    data = [rng.randint(1, 30000), rng.uniform(0.1, 5), rng.uniform(30, 150)]
+    if workout_type == 'WLK':
+        data.append(rng.uniform(120, 220))
+    elif workout_type == 'SWM':
+        data += [rng.uniform(10, 50), rng.randint(1, 100)]
+    return data
+
+
+@pytest.mark.parametrize('workout_type', ['SWM', 'RUN', 'WLK'])
+def test_kernels_match_methods(workout_type):
+    rng = random.Random(workout_type)
+    training_class = homework.get_workout_class(workout_type)
+    kernel = homework.get_kernel(training_class)
+    for _ in range(500):
+        data = _random_package(rng, workout_type)
+        expected = homework.read_package(workout_type, data).compute_metrics()
+        assert kernel(*data) == pytest.approx(expected, rel=1e-12), (
+            'Специализированная функция должна совпадать с методами `get_*`.'
+        )
+
+
+def test_kernel_for_subclass():
+    class FastRunning(homework.Running):
+        COEFF_CALORIES_1 = 20
+        LEN_STEP = 0.8
+
+    kernel = homework.get_kernel(FastRunning)
+    assert kernel is not homework.get_kernel(homework.Running)
+    expected = FastRunning(9000, 1, 75).compute_metrics()
+    assert kernel(9000, 1, 75) == pytest.approx(expected, rel=1e-12)
+
+
+def _write_jsonl(path, packages):
+    path.write_text(''.join(json.dumps(package) + '\n'
+                            for package in packages))
+    return str(path)
+
+
+@pytest.mark.parametrize('shards', [1, 3, 7, 20])
+def test_split_shards(tmp_path, shards):
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES * 4)
+    ranges = homework.split_shards(path, shards)
+    content = open(path, 'rb').read()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert content[start - 1:start] == b'\n', (
+            'Границы диапазонов должны совпадать с концами строк.'
+        )
+
+
+def test_ShardCoordinator(tmp_path):
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES * 5)
+    output = StringIO()
+    report = homework.ShardCoordinator(nodes=2).run(path, output, shards=4)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT * 5, (
+        'Координатор должен выводить сообщения в порядке файла.'
+    )
+    assert report.packages == 15
+    assert report.totals['Running'][0] == 5
+    assert report.totals['Swimming'][3] == pytest.approx(336.0 * 5)
+
+
+def test_ShardCoordinator_retries(tmp_path, monkeypatch):
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES * 2)
+    marker = tmp_path / 'failed'
+    process_shard = homework.process_shard
+
+    def flaky_process_shard(*arguments):
+        if not marker.exists():
+            marker.write_text('')
+            os._exit(1)
+        return process_shard(*arguments)
+
+    monkeypatch.setattr(homework, 'process_shard', flaky_process_shard)
+    output = StringIO()
+    report = homework.ShardCoordinator(nodes=1).run(path, output, shards=2)
+    assert report.retries == 1
+    assert output.getvalue().splitlines() == MAIN_OUTPUT * 2
+
+
+def test_ShardCoordinator_small_shards(tmp_path):
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES * 20)
+    output = StringIO()
+    report = homework.ShardCoordinator(nodes=2, shard_bytes=100).run(
+        path, output)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT * 20, (
+        'Мелкие диапазоны должны выводиться в порядке файла.'
+    )
+    assert report.packages == 60
+
+
+def test_ShardCoordinator_node_never_connects(tmp_path, monkeypatch):
+    def silent_worker(address, authkey):
+        pass
+
+    monkeypatch.setattr(homework, '_shard_worker', silent_worker)
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES)
+    coordinator = homework.ShardCoordinator(nodes=1, retries=1,
+                                            connect_timeout=0.5)
+    with pytest.raises(RuntimeError):
+        coordinator.run(path, StringIO())
+
+
+def test_process_shard_range(tmp_path):
+    path = _write_jsonl(tmp_path / 'packages.jsonl', PACKAGES * 3)
+    (start, end), *_ = homework.split_shards(path, 3)
+    messages, totals, skipped = homework.process_shard(path, start, end,
+                                                       chunk_size=2)
+    assert messages == MAIN_OUTPUT
+    assert totals['Swimming'][0] == 1
+    assert skipped == 0
+
+
+def test_ShardCoordinator_skips_bad_rows(tmp_path):
+    lines = [json.dumps(package) for package in PACKAGES]
+    bad = ['["RUN", [1, 1]]', 'not json', '["WLK", [1e200, 1e-100, 75, 180]]']
+    path = tmp_path / 'packages.jsonl'
+    path.write_text('\n'.join(lines + bad + lines) + '\n')
+    output = StringIO()
+    report = homework.ShardCoordinator(nodes=2, retries=0).run(
+        str(path), output, shards=3)
+    assert output.getvalue().splitlines() == MAIN_OUTPUT * 2, (
+        'Некорректные строки не должны прерывать обработку файла.'
+    )
+    assert (report.packages, report.skipped) == (6, 3)
+
+
+def test_QuantileSketch_accuracy():
+    rng = random.Random(19)
+    values = [rng.lognormvariate(3, 1.5) * rng.choice([1, 1, 1, -1])
+              for _ in range(20000)] + [0.0] * 100
+    first = homework.QuantileSketch(0.01)
+    second = homework.QuantileSketch(0.01)
+    first.update(values[::2])
+    second.update(values[1::2])
+    first.merge(second)
+    exact = sorted(values)
+    for q in (0.0, 0.01, 0.25, 0.5, 0.95, 0.99, 1.0):
+        expected = exact[int(q * (len(exact) - 1))]
+        assert first.quantile(q) == pytest.approx(expected, rel=0.01,
+                                                  abs=1e-9), (
+            f'Квантиль {q} должен отличаться не больше чем на 1%.'
+        )
+
+
+def test_HyperLogLog_accuracy():
+    first = homework.HyperLogLog(precision=12)
+    second = homework.HyperLogLog(precision=12)
+    for index in range(30000):
+        (first if index % 2 else second).add(f'athlete-{index % 20000}')
+    first.merge(second)
+    assert first.count() == pytest.approx(20000, rel=0.05)
+    small = homework.HyperLogLog(precision=12)
+    for index in range(100):
+        small.add(index)
+    assert small.count() == pytest.approx(100, rel=0.05)
+
+
+def test_MetricSketches():
+    rng = random.Random(7)
+    rows = [_random_package(rng, 'RUN') for _ in range(2000)]
+    columns = dict(zip(homework.Running.FIELDS, zip(*rows)))
+    metrics = homework.compute_batch('RUN', columns)
+    sketches = homework.MetricSketches()
+    sketches.add_batch('RUN', metrics, (index % 300 for index in range(2000)))
+    other = homework.MetricSketches()
+    for info in homework.process_packages(PACKAGES):
+        other.add(info, athlete='anna')
+    sketches.merge(other)
+    speeds = sorted(list(metrics['speed']) + [5.85])
+    assert sketches.quantile('Running', 'speed', 0.95) == pytest.approx(
+        speeds[int(0.95 * (len(speeds) - 1))], rel=0.01)
+    assert sketches.distinct_athletes('Running') == pytest.approx(301,
+                                                                  rel=0.05)
+    assert sketches.distinct_athletes() == pytest.approx(301, rel=0.05)
+
+
+@pytest.mark.parametrize('workout_type', ['SWM', 'RUN', 'WLK'])
+def test_compute_batch_float32(workout_type):
+    rng = random.Random(20)
+    training_class = homework.get_workout_class(workout_type)
+    rows = [_random_package(rng, workout_type) for _ in range(300)]
+    columns = dict(zip(training_class.FIELDS, zip(*rows)))
+    reference = homework.compute_batch(workout_type, columns)
+    result = homework.compute_batch(workout_type, columns, 'float32')
+    assert result['speed'].itemsize == 4, (
+        'В режиме float32 метрики должны храниться в одинарной точности.'
+    )
+    for name in ('distance', 'speed'):
+        assert list(result[name]) == pytest.approx(list(reference[name]),
+                                                   rel=1e-6)
+    if workout_type == 'SWM':
+        assert list(result['calories']) == pytest.approx(
+            list(reference['calories']), rel=1e-6)
+
+
+def test_compute_batch_unknown_precision():
+    with pytest.raises(ValueError):
+        homework.compute_batch('RUN', {}, 'float16')
+
+
+def test_TrainingBatch_float32():
+    batch = homework.TrainingBatch('RUN', [[9000, 1, 75]], 'float32')
+    assert batch.columns['weight'].itemsize == 4
+    calories = batch.compute()['calories'][0]
+    assert calories == pytest.approx(383.85, rel=1e-6)
+    assert f'{calories:.3f}' == '383.850'
+
+
+def test_main_sink():
+    output = StringIO()
+    with homework.BufferedSink(output, flush_size=2,
+                               flush_interval=60) as sink:
+        for package in PACKAGES:
+            homework.main(homework.read_package(*package), sink)
+        assert output.getvalue().splitlines() == MAIN_OUTPUT[:2], (
+            '`BufferedSink` должен писать порциями по `flush_size` строк.'
+        )
+    assert output.getvalue().splitlines() == MAIN_OUTPUT
+
+
+def test_BufferedSink_flushes_when_idle():
+    output = StringIO()
+    with homework.BufferedSink(output, flush_size=100,
+                               flush_interval=0.05) as sink:
+        sink.write(MAIN_OUTPUT[0])
+        for _ in range(100):
+            if output.getvalue():
+                break
+            threading.Event().wait(0.01)
+        assert output.getvalue().splitlines() == MAIN_OUTPUT[:1], (
+            'Буфер должен дописываться по `flush_interval` без новых строк.'
+        )
+
+
+def test_RotatingFileSink(tmp_path):
+    path = str(tmp_path / 'messages.log')
+    sink = homework.RotatingFileSink(path, max_bytes=300, backup_count=2,
+                                     flush_size=1)
+    for message in MAIN_OUTPUT * 2:
+        sink.write(message)
+    sink.close()
+    lines = []
+    for name in (path + '.2', path + '.1', path):
+        with open(name, encoding='utf-8') as source:
+            lines += source.read().splitlines()
+    assert lines == (MAIN_OUTPUT * 2)[-len(lines):]
+    assert not os.path.exists(path + '.3')
+
+
+def test_AsyncQueueSink():
+    async def scenario():
+        queue = asyncio.Queue()
+        sink = homework.AsyncQueueSink(queue, flush_size=2)
+        stats = homework.run_stream(PACKAGES, sink)
+        chunks = []
+        while not queue.empty():
+            chunks.append(queue.get_nowait())
+        return stats, chunks
+
+    stats, chunks = asyncio.run(scenario())
+    assert stats.packages == 3
+    assert len(chunks) == 2
+    assert ''.join(chunks).splitlines() == MAIN_OUTPUT
+
+
+def test_DedupIndex(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite')
+    with homework.DedupIndex(path) as index:
+        packages = PACKAGES + [('RUN', [1206.0, 12.0, 6.0])] + PACKAGES
+        assert list(index.filter_new(packages)) == PACKAGES, (
+            'Повторные пакеты должны отбрасываться.'
+        )
+    with homework.DedupIndex(path) as index:
+        assert len(index) == 3
+        assert not index.add('SWM', [720, 1, 80, 25, 40]), (
+            'Индекс должен сохраняться между перезапусками.'
+        )
+        assert index.add('SWM', [720, 1, 80, 25, 41])
+
+
+def test_DedupIndex_expiry(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / 'dedup.sqlite')
+    with homework.DedupIndex(path, ttl=60, clock=lambda: now[0]) as index:
+        assert index.add('RUN', [1206, 12, 6])
+        now[0] += 30
+        assert index.add('WLK', [9000, 1, 75, 180])
+        assert not index.add('RUN', [1206, 12, 6])
+        now[0] += 45
+        assert index.compact() == 1
+        assert len(index) == 1
+        assert index.add('RUN', [1206, 12, 6]), (
+            'Истёкшие отпечатки не должны считаться повторами.'
+        )
+
+
+def test_BloomFilter():
+    bloom = homework.BloomFilter(capacity=1000, error_rate=0.01)
+    for value in range(1000):
+        bloom.add(homework.package_fingerprint('RUN', [value, 1, 1]))
+    assert all(homework.package_fingerprint('RUN', [value, 1, 1]) in bloom
+               for value in range(1000))
+    false_positives = sum(
+        homework.package_fingerprint('WLK', [value, 1, 1, 1]) in bloom
+        for value in range(10000))
+    assert false_positives < 300
+
+
+def test_package_fingerprint_distinct():
+    fingerprint = homework.package_fingerprint
+    assert fingerprint('RUN', [1206, 12, 6]) == fingerprint(
+        'RUN', [1206.0, 12.0, 6.0])
+    assert fingerprint('CYCLE', [1, 1]) != fingerprint('CYCLX', [1, 1]), (
+        'Отпечаток должен учитывать код тренировки целиком.'
+    )
+    assert fingerprint('RUN', [1, 1, 1]) != fingerprint('RUN', [1, 1, 1, 0])
+    assert fingerprint('LONG', list(range(8)))
+
+
+def test_DedupIndex_grows_filter(tmp_path):
+    path = str(tmp_path / 'dedup.sqlite')
+    packages = [('RUN', [value, 1, 75]) for value in range(300)]
+    with homework.DedupIndex(path, capacity=100, commit_every=64) as index:
+        assert list(index.filter_new(packages)) == packages
+        assert index._filter.capacity >= 300, (
+            'Фильтр Блума должен расти вместе с индексом.'
+        )
+        assert not any(index.add(*package) for package in packages)
+    with homework.DedupIndex(path, capacity=100) as index:
+        assert index._filter.capacity >= 600, (
+            'Размер фильтра должен выбираться по числу записей в базе.'
+        )
+        assert len(index) == 300
+
+
+def test_compute_intervals():
+    actions = [200 + 10 * minute for minute in range(60)]
+    report = homework.compute_intervals('RUN', [0, 1, 75],
+                                        {'action': actions})
+    expected = homework.read_package('RUN', [sum(actions), 1, 75])
+    assert report.total == pytest.approx(expected.compute_metrics())
+    assert report.interval == pytest.approx(1 / 60)
+    assert len(report.intervals['speed']) == 60
+    assert report.intervals['speed'][0] < report.intervals['speed'][-1], (
+        'Скорость должна считаться по шагам каждого интервала.'
+    )
+    assert sum(report.intervals['calories']) == pytest.approx(
+        report.total.calories), (
+        'Калории бега по интервалам должны складываться в итог.'
+    )
+
+
+def test_compute_intervals_swimming_laps():
+    report = homework.compute_intervals('SWM', [720, 1, 80, 25, 40],
+                                        {'count_pool': [2, 0] * 20})
+    assert report.total == pytest.approx(
+        homework.read_package('SWM', [720, 1, 80, 25, 40]).compute_metrics())
+    assert list(report.intervals['speed'][:2]) == pytest.approx([2.0, 0.0])
+    assert sum(report.intervals['distance']) == pytest.approx(
+        report.total.distance), (
+        'Гребки без ряда должны делиться между интервалами поровну.'
+    )
+    assert sum(report.intervals['calories']) == pytest.approx(
+        report.total.calories), (
+        'Калории плавания по интервалам должны складываться в итог.'
+    )
+    assert report.intervals['calories'][0] > report.intervals['calories'][1]
+
+
+@pytest.mark.parametrize('series', [
+    {'weight': [75, 75]},
+    {'action': []},
+    {'action': [1, 2], 'count_pool': [1]},
+])
+def test_compute_intervals_invalid_series(series):
+    with pytest.raises(ValueError):
+        homework.compute_intervals('SWM', [720, 1, 80, 25, 40], series)